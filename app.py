@@ -1,9 +1,19 @@
 import click
-from flask.cli import with_appcontext
+from flask import current_app
+from flask.cli import with_appcontext, ScriptInfo
 from app import create_app
 from app.models.database import db
 from app.models.user import User
+from app.models.course import Course, CourseEnrollment
+from app.models.classroom import ClassSession
+from app.models.schedule import Schedule, ScheduleExclusion
+from app.services.reader_auth import derive_reader_key
+from app.services.session_materializer import materialize_sessions
+from app.services.schedule_conflicts import audit_timetable
+from app.services.hot_queries import HOT_QUERIES, create_missing_indexes, explain, analyze
 import sys # <-- Add this import
+import json
+import time
 
 # Create Flask app
 app = create_app()
@@ -13,6 +23,9 @@ app = create_app()
 def init_db_command():
     """Clear the existing data and create new tables."""
     db.create_all()
+    # create_all() skips tables that already exist, indexes included
+    for index in create_missing_indexes():
+        click.echo(f'Created index {index.name}.')
     click.echo('Initialized the database.')
 
 @click.command('create-admin')
@@ -32,8 +45,143 @@ def create_admin_command():
     else:
         click.echo('Admin user already exists.')
 
+@click.command('reader-key')
+@click.argument('nfc_reader_id')
+@with_appcontext
+def reader_key_command(nfc_reader_id):
+    """Print the signing key to provision on an NFC reader."""
+    master_key = current_app.config.get('NFC_API_KEY')
+    if not master_key:
+        click.echo('NFC_API_KEY is not set; reader requests are not being verified.')
+        return
+    click.echo(derive_reader_key(master_key, nfc_reader_id).hex())
+
+@click.command('materialize-sessions')
+@click.option('--from', 'date_from', required=True, type=click.DateTime(formats=['%Y-%m-%d']),
+              help='First date to create sessions for (YYYY-MM-DD).')
+@click.option('--to', 'date_to', required=True, type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Last date to create sessions for (YYYY-MM-DD).')
+@with_appcontext
+def materialize_sessions_command(date_from, date_to):
+    """Create class sessions from active schedules for a date range."""
+    if date_to < date_from:
+        raise click.BadParameter('--to must not be before --from')
+
+    # Databases created before the slot index existed get it here
+    for index in ClassSession.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+    started = time.perf_counter()
+    created = materialize_sessions(date_from.date(), date_to.date())
+    db.session.commit()
+    click.echo(f'Created {created} class sessions in {time.perf_counter() - started:.2f}s.')
+
+@click.command('backfill-schedule-exclusions')
+@with_appcontext
+def backfill_schedule_exclusions_command():
+    """Rebuild the schedule_exclusions table from Schedule.exclusion_dates."""
+    ScheduleExclusion.__table__.create(db.engine, checkfirst=True)
+
+    rows = []
+    for schedule in Schedule.query.filter(Schedule.exclusion_dates.isnot(None)):
+        rows.extend({'schedule_id': schedule.id, 'excluded_date': excluded_date}
+                    for excluded_date in schedule.excluded_dates)
+
+    db.session.execute(ScheduleExclusion.__table__.delete())
+    if rows:
+        db.session.execute(ScheduleExclusion.__table__.insert(), rows)
+    db.session.commit()
+    click.echo(f'Indexed {len(rows)} exclusion dates.')
+
+@click.command('repair-enrollment-counts')
+@with_appcontext
+def repair_enrollment_counts_command():
+    """Recompute Course.active_enrollment_count from the enrollments table."""
+    courses = Course.__table__
+    enrollments = CourseEnrollment.__table__
+    # Databases created before the counter existed need the column first
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('courses')}
+    if 'active_enrollment_count' not in columns:
+        db.session.execute(db.text(
+            'ALTER TABLE courses ADD COLUMN active_enrollment_count INTEGER NOT NULL DEFAULT 0'
+        ))
+        click.echo('Added courses.active_enrollment_count.')
+
+    actual = db.select(db.func.count()).where(
+        enrollments.c.course_id == courses.c.id,
+        enrollments.c.is_active == True
+    ).scalar_subquery()
+    drifted = db.session.execute(courses.update().where(
+        courses.c.active_enrollment_count != actual
+    ).values(active_enrollment_count=actual)).rowcount
+    db.session.commit()
+    click.echo(f'Recounted enrollments; {drifted} courses were out of date.')
+
+@click.command('db-optimize')
+@with_appcontext
+def db_optimize_command():
+    """Create missing hot-path indexes, run ANALYZE and compare query plans."""
+    before = {query.name: explain(query.build()) for query in HOT_QUERIES}
+
+    missing = create_missing_indexes()
+    for index in missing:
+        click.echo(f'Created index {index.name}.')
+    if not missing:
+        click.echo('All declared indexes already exist.')
+    analyze()
+    click.echo('Ran ANALYZE.')
+
+    unused = 0
+    for query in HOT_QUERIES:
+        after = explain(query.build())
+        used = any(query.index in line for line in after)
+        unused += not used
+        click.echo(f"\n{query.name}: {'uses' if used else 'does NOT use'} {query.index}")
+        if before[query.name] != after:
+            for line in before[query.name]:
+                click.echo(f'  before: {line}')
+        for line in after:
+            click.echo(f'  after:  {line}')
+
+    if unused:
+        click.echo(f'\n{unused} hot queries do not use their index.')
+        sys.exit(1)
+
+@click.command('audit-timetable')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Write the full report as JSON.')
+@with_appcontext
+def audit_timetable_command(output):
+    """Report room, teacher and student clashes in the active timetable."""
+    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    started = time.perf_counter()
+    report = audit_timetable()
+    summary = report['summary']
+    click.echo(f"Audited {summary['schedules']} schedules in {time.perf_counter() - started:.2f}s: "
+               f"{summary['room_conflicts']} room, {summary['teacher_conflicts']} teacher and "
+               f"{summary['student_conflicts']} student conflicts "
+               f"({summary['students_affected']} students affected).")
+
+    for kind in ('room_conflicts', 'teacher_conflicts', 'student_conflicts'):
+        for conflict in report[kind][:10]:
+            first, second = conflict['schedules']
+            detail = f" ({conflict['student_count']} students)" if 'student_count' in conflict else ''
+            click.echo(f"  {kind.split('_')[0]}: {days[conflict['day_of_week']]} "
+                       f"{first['course_code']} {first['start_time']}-{first['end_time']} vs "
+                       f"{second['course_code']} {second['start_time']}-{second['end_time']}{detail}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        click.echo(f'Full report written to {output}')
+
 app.cli.add_command(init_db_command)
 app.cli.add_command(create_admin_command)
+app.cli.add_command(reader_key_command)
+app.cli.add_command(materialize_sessions_command)
+app.cli.add_command(backfill_schedule_exclusions_command)
+app.cli.add_command(repair_enrollment_counts_command)
+app.cli.add_command(db_optimize_command)
+app.cli.add_command(audit_timetable_command)
 
 if __name__ == '__main__':
     # ADD THIS NEW BLOCK
@@ -41,6 +189,8 @@ if __name__ == '__main__':
         if sys.argv[1] == 'init-db':
             with app.app_context():
                 db.create_all()
+                for index in create_missing_indexes():
+                    print(f'Created index {index.name}.')
             print('Initialized the database.')
             sys.exit()
         elif sys.argv[1] == 'create-admin':
@@ -58,5 +208,9 @@ if __name__ == '__main__':
                 else:
                     print('Admin user already exists.')
             sys.exit()
+        elif sys.argv[1] in app.cli.commands:
+            # `flask --app app.py` would import the app package rather than this
+            # file, so the other commands are run from here: python app.py <command>
+            app.cli.main(args=sys.argv[1:], prog_name='python app.py', obj=ScriptInfo(create_app=lambda: app))
     # END OF NEW BLOCK
     app.run()
\ No newline at end of file
@@ -3,6 +3,11 @@ from flask_login import LoginManager
 from .config import config
 from .models.user import User
 from .models.database import db
+from .services import (
+    tap_resolver, session_index, enrollment_index, tap_spool, tap_dedup, stage_timings, reader_auth,
+    schedule_index, room_availability, timetable_cache, lazy_load_guard,
+    query_budget, slow_query_log
+)
 import os
 
 def create_app(config_name=None):
@@ -14,6 +19,19 @@ def create_app(config_name=None):
 
     # Initialize extensions
     db.init_app(app)
+    tap_resolver.init_app(app)
+    session_index.init_app(app)
+    enrollment_index.init_app(app)
+    tap_spool.init_app(app)
+    tap_dedup.init_app(app)
+    stage_timings.init_app(app)
+    reader_auth.init_app(app)
+    schedule_index.init_app(app)
+    room_availability.init_app(app)
+    timetable_cache.init_app(app)
+    lazy_load_guard.init_app(app)
+    query_budget.init_app(app)
+    slow_query_log.init_app(app)
 
     # Flask-Login setup
     login_manager = LoginManager()
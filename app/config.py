@@ -7,16 +7,72 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-me'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///attendance_system.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    NFC_API_KEY = os.environ.get('NFC_API_KEY')
+    NFC_API_KEY = os.environ.get('NFC_API_KEY')  # unset disables reader signature checks
+    NFC_SIGNATURE_MAX_SKEW = int(os.environ.get('NFC_SIGNATURE_MAX_SKEW') or 30)  # seconds
+    NFC_NONCE_CAPACITY = int(os.environ.get('NFC_NONCE_CAPACITY') or 100000)
+
+    # Tap path caches
+    TAP_RESOLVER_CACHE_SIZE = int(os.environ.get('TAP_RESOLVER_CACHE_SIZE') or 10000)
+    # Other workers' writes only reach these caches when entries expire; 0 keeps them until invalidated
+    TAP_RESOLVER_TTL_SECONDS = int(os.environ.get('TAP_RESOLVER_TTL_SECONDS') or 60)
+    SESSION_INDEX_TTL_SECONDS = int(os.environ.get('SESSION_INDEX_TTL_SECONDS') or 30)
+    ENROLLMENT_INDEX_TTL_SECONDS = int(os.environ.get('ENROLLMENT_INDEX_TTL_SECONDS') or 60)
+    TAP_BATCH_MAX_EVENTS = int(os.environ.get('TAP_BATCH_MAX_EVENTS') or 5000)
+    OFFLINE_LOG_MAX_EVENTS = int(os.environ.get('OFFLINE_LOG_MAX_EVENTS') or 100000)
+    TAP_DEDUP_WINDOW_SECONDS = int(os.environ.get('TAP_DEDUP_WINDOW_SECONDS') or 30)  # 0 disables
+    TAP_DEDUP_CAPACITY = int(os.environ.get('TAP_DEDUP_CAPACITY') or 8192)
+
+    # 'warn' logs, 'raise' fails, on relationship lazy loads during template rendering; unset disables
+    LAZY_LOAD_GUARD = os.environ.get('LAZY_LOAD_GUARD')
+
+    # Per-request SQL accounting; requests over either budget, and statements run with more than
+    # SQL_REPEAT_THRESHOLD parameter sets, are logged. SQL_STATS_HEADERS adds X-SQL-* response headers.
+    SQL_BUDGET_ENABLED = os.environ.get('SQL_BUDGET_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    SQL_QUERY_BUDGET = int(os.environ.get('SQL_QUERY_BUDGET') or 30)
+    SQL_TIME_BUDGET_MS = int(os.environ.get('SQL_TIME_BUDGET_MS') or 500)
+    SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD') or 10)
+    SQL_STATS_HEADERS = os.environ.get('SQL_STATS_HEADERS', '').lower() in ('1', 'true', 'yes')
+
+    # Opt-in slow statement log (JSONL, size-rotated); a sample of entries get an EXPLAIN plan
+    SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG_ENABLED', '').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_LOG_PATH = os.environ.get('SLOW_QUERY_LOG_PATH')  # defaults to instance/slow_queries.jsonl
+    SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS') or 100)
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_SAMPLE_RATE') or 0.1)
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES') or 5 * 1024 * 1024)
+    SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS') or 3)
+
+    SCHEDULE_IMPORT_MAX_ENTRIES = int(os.environ.get('SCHEDULE_IMPORT_MAX_ENTRIES') or 5000)
+
+    # Taps within these minutes of a session's end_time record check_out_time; 0 and 0 disables check-out
+    CHECK_OUT_WINDOW_BEFORE_END = int(os.environ.get('CHECK_OUT_WINDOW_BEFORE_END') or 10)
+    CHECK_OUT_WINDOW_AFTER_END = int(os.environ.get('CHECK_OUT_WINDOW_AFTER_END') or 15)
+
+    # Stage timing histograms cover STAGE_TIMING_SLICES x STAGE_TIMING_SLICE_SECONDS
+    STAGE_TIMING_SLICES = 6
+    STAGE_TIMING_SLICE_SECONDS = 10
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+    # Write-behind tap spool (off by default)
+    TAP_SPOOL_ENABLED = os.environ.get('TAP_SPOOL_ENABLED', '').lower() in ('1', 'true', 'yes')
+    TAP_SPOOL_PATH = os.environ.get('TAP_SPOOL_PATH')  # defaults to instance/tap_spool.jsonl
+    TAP_SPOOL_FSYNC_INTERVAL = float(os.environ.get('TAP_SPOOL_FSYNC_INTERVAL') or 0.005)
+    TAP_SPOOL_FLUSH_INTERVAL = float(os.environ.get('TAP_SPOOL_FLUSH_INTERVAL') or 0.5)
+    TAP_SPOOL_FLUSH_BATCH_SIZE = int(os.environ.get('TAP_SPOOL_FLUSH_BATCH_SIZE') or 500)
+    TAP_SPOOL_COMPACT_BYTES = int(os.environ.get('TAP_SPOOL_COMPACT_BYTES') or 16 * 1024 * 1024)  # drained spool size that triggers truncation
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    SERVER_TIMING_ENABLED = True
+    LAZY_LOAD_GUARD = os.environ.get('LAZY_LOAD_GUARD') or 'warn'
+    SQL_STATS_HEADERS = True
 
 class ProductionConfig(Config):
     DEBUG = False
+    SQL_BUDGET_ENABLED = os.environ.get('SQL_BUDGET_ENABLED', '').lower() in ('1', 'true', 'yes')
 
 class TestingConfig(Config):
     TESTING = True
+    SQL_STATS_HEADERS = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test.db'
 
 config = {
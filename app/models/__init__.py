@@ -4,7 +4,7 @@ from .student import Student
 from .course import Course, CourseEnrollment
 from .classroom import Classroom, ClassSession
 from .attendance import Attendance
-from .schedule import Schedule
+from .schedule import Schedule, ScheduleExclusion
 
 __all__ = [
     'db',
@@ -15,5 +15,6 @@ __all__ = [
     'Classroom',
     'ClassSession',
     'Attendance',
-    'Schedule'
+    'Schedule',
+    'ScheduleExclusion'
 ]
\ No newline at end of file
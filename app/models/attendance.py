@@ -1,5 +1,7 @@
-from .database import db
-from datetime import datetime
+from .database import db, chunked, insert_ignoring_conflicts
+from datetime import datetime, time, timedelta
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
 
 
 class Attendance(db.Model):
@@ -8,13 +10,128 @@ class Attendance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
     class_session_id = db.Column(db.Integer, db.ForeignKey('class_sessions.id'), nullable=False)
-    check_in_time = db.Column(db.DateTime, default=datetime.utcnow)
+    check_in_time = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     check_out_time = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='present')  # present, absent, late
     method = db.Column(db.String(20), default='nfc')  # nfc, manual, temp_card
     notes = db.Column(db.Text)
     
-    __table_args__ = (db.UniqueConstraint('student_id', 'class_session_id'),)
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'class_session_id'),
+        # Attendance per session by status, for day totals grouped by session date
+        db.Index('ix_attendance_records_session_status', 'class_session_id', 'status'),
+    )
+    
+    @classmethod
+    def checked_in_between(cls, date_from=None, date_to=None):
+        """
+        Filter clauses for check-ins on the days date_from..date_to (inclusive,
+        either may be None), as a half-open check_in_time range that can use
+        the column's index.
+        """
+        clauses = []
+        if date_from:
+            clauses.append(cls.check_in_time >= datetime.combine(date_from, time.min))
+        if date_to:
+            clauses.append(cls.check_in_time < datetime.combine(date_to + timedelta(days=1), time.min))
+        return clauses
+    
+    @classmethod
+    def record_check_in(cls, student_id, class_session_id, check_in_time, status='present', method='nfc', notes=None):
+        """
+        Insert an attendance row unless the student already has one for the session,
+        in a single INSERT ... ON CONFLICT DO NOTHING ... RETURNING statement.
+        Returns (created, attendance_id, check_in_time); for a duplicate these are
+        the values of the row that was already there.
+        """
+        values = {
+            'student_id': student_id,
+            'class_session_id': class_session_id,
+            'check_in_time': check_in_time,
+            'status': status,
+            'method': method,
+            'notes': notes
+        }
+        
+        stmt = insert_ignoring_conflicts(cls.__table__, ['student_id', 'class_session_id'])
+        if stmt is not None:
+            row = db.session.execute(
+                stmt.values(**values).returning(cls.id, cls.check_in_time)
+            ).first()
+            if row is not None:
+                return True, row.id, row.check_in_time
+        else:
+            try:
+                with db.session.begin_nested():
+                    result = db.session.execute(cls.__table__.insert().values(**values))
+                return True, result.inserted_primary_key[0], check_in_time
+            except IntegrityError:
+                pass
+        
+        existing = db.session.query(cls.id, cls.check_in_time).filter_by(
+            student_id=student_id,
+            class_session_id=class_session_id
+        ).first()
+        return False, existing.id, existing.check_in_time
+    
+    @classmethod
+    def record_check_out(cls, student_id, class_session_id, check_out_time):
+        """
+        Set check_out_time on the student's row for the session with a single
+        UPDATE on the (student_id, class_session_id) unique index, unless it is
+        already set. Returns True if a row was updated.
+        """
+        result = db.session.execute(
+            cls.__table__.update().where(
+                cls.student_id == student_id,
+                cls.class_session_id == class_session_id,
+                cls.check_out_time.is_(None)
+            ).values(check_out_time=check_out_time)
+        )
+        return result.rowcount == 1
+    
+    @classmethod
+    def record_check_outs(cls, check_out_times):
+        """
+        Set check_out_time on many rows, given as {attendance_id: check_out_time},
+        skipping rows already checked out, with one UPDATE ... RETURNING per
+        chunk of ids. Returns the set of ids actually updated.
+        """
+        updated = set()
+        returning = db.session.get_bind().dialect.update_returning
+        for ids in chunked(check_out_times):
+            stmt = cls.__table__.update().where(
+                cls.id.in_(ids),
+                cls.check_out_time.is_(None)
+            ).values(check_out_time=case({i: check_out_times[i] for i in ids}, value=cls.id))
+            if returning:
+                updated.update(row.id for row in db.session.execute(stmt.returning(cls.id)))
+                continue
+            for attendance_id in ids:
+                result = db.session.execute(cls.__table__.update().where(
+                    cls.id == attendance_id,
+                    cls.check_out_time.is_(None)
+                ).values(check_out_time=check_out_times[attendance_id]))
+                if result.rowcount == 1:
+                    updated.add(attendance_id)
+        return updated
+    
+    @classmethod
+    def insert_ignoring_duplicates(cls, rows):
+        """
+        Bulk insert attendance rows, skipping any (student_id, class_session_id)
+        pair that already exists. Returns the set of pairs actually inserted.
+        """
+        if not rows:
+            return set()
+        
+        stmt = insert_ignoring_conflicts(cls.__table__, ['student_id', 'class_session_id'])
+        if stmt is None:
+            db.session.execute(cls.__table__.insert(), rows)
+            return {(row['student_id'], row['class_session_id']) for row in rows}
+        
+        result = db.session.execute(stmt.returning(cls.student_id, cls.class_session_id), rows)
+        return {(row.student_id, row.class_session_id) for row in result}
     
     def __repr__(self):
-        return f'<Attendance {self.student.full_name} - {self.class_session.course.course_code}>'
\ No newline at end of file
+        return f'<Attendance {self.student.full_name} - {self.class_session.course.course_code}>'
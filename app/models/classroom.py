@@ -30,6 +30,13 @@ class ClassSession(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # One session per course, room and start; lets schedule expansion skip existing rows
+    __table_args__ = (
+        db.Index('ux_class_sessions_slot', 'course_id', 'classroom_id', 'session_date', 'start_time', unique=True),
+        db.Index('ix_class_sessions_room_date', 'classroom_id', 'session_date', 'start_time'),
+        db.Index('ix_class_sessions_date', 'session_date'),
+    )
+    
     # Relationships
     attendances = db.relationship('Attendance', backref='class_session', lazy='dynamic')
     
@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy import event, inspect
 from .database import db
 
 
@@ -15,6 +16,8 @@ class Course(db.Model):
     teacher_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Maintained by the CourseEnrollment events below; `flask repair-enrollment-counts` recomputes it
+    active_enrollment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relationships
     teacher = db.relationship('User', backref='teaching_courses')
@@ -29,10 +32,48 @@ class CourseEnrollment(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    # active_history keeps the old values around for the enrollment counter events
+    course_id = db.column_property(db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False), active_history=True)
     enrollment_date = db.Column(db.DateTime, default=datetime.utcnow)
-    is_active = db.Column(db.Boolean, default=True)
+    is_active = db.column_property(db.Column(db.Boolean, default=True), active_history=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'course_id'),
+        db.Index('ix_course_enrollments_course_active', 'course_id', 'is_active'),
+    )
+
+
+def _adjust_enrollment_count(connection, course_id, delta):
+    table = Course.__table__
+    connection.execute(table.update().where(table.c.id == course_id).values(
+        active_enrollment_count=table.c.active_enrollment_count + delta
+    ))
+
+
+@event.listens_for(CourseEnrollment, 'after_insert')
+def _count_new_enrollment(mapper, connection, target):
+    if target.is_active:
+        _adjust_enrollment_count(connection, target.course_id, 1)
+
+
+@event.listens_for(CourseEnrollment, 'after_update')
+def _count_changed_enrollment(mapper, connection, target):
+    attrs = inspect(target).attrs
+    course_history = attrs.course_id.history
+    active_history = attrs.is_active.history
+    if not (course_history.has_changes() or active_history.has_changes()):
+        return
     
-    __table_args__ = (db.UniqueConstraint('student_id', 'course_id'),)
+    old_course_id = course_history.deleted[0] if course_history.deleted else target.course_id
+    was_active = active_history.deleted[0] if active_history.deleted else target.is_active
+    if was_active:
+        _adjust_enrollment_count(connection, old_course_id, -1)
+    if target.is_active:
+        _adjust_enrollment_count(connection, target.course_id, 1)
 
 
+@event.listens_for(CourseEnrollment, 'after_delete')
+def _count_removed_enrollment(mapper, connection, target):
+    was_active = inspect(target).attrs.is_active.history.deleted
+    if (was_active[0] if was_active else target.is_active):
+        _adjust_enrollment_count(connection, target.course_id, -1)
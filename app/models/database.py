@@ -1,3 +1,66 @@
+import time
 from flask_sqlalchemy import SQLAlchemy
-db = SQLAlchemy()  
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
+db = SQLAlchemy()
+
+# Keeps IN (...) lists well under SQLite's bound parameter limit
+IN_CLAUSE_CHUNK_SIZE = 500
+
+
+def chunked(values, size=IN_CLAUSE_CHUNK_SIZE):
+    """Yield lists of at most `size` values, for IN queries over large key sets."""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def insert_ignoring_conflicts(table, index_elements):
+    """
+    Build an INSERT ... ON CONFLICT DO NOTHING statement for the bound dialect.
+    Returns None on dialects without an ON CONFLICT clause, so callers can fall
+    back to a plain insert.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table).on_conflict_do_nothing(index_elements=index_elements)
+
+
+def time_cursor_executes(engine, callback):
+    """
+    Call callback(conn, statement, parameters, executemany, seconds) after each
+    statement the engine runs. Statements that raise are not reported.
+    """
+    key = ('time_cursor_executes', id(callback))
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _started(conn, cursor, statement, parameters, context, executemany):
+        conn.info[key] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _finished(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop(key, None)
+        if started is not None:
+            callback(conn, statement, parameters, executemany, time.perf_counter() - started)
+
+
+def run_after_commit(session, callback):
+    """Queue a callback to run once the session's current transaction commits."""
+    session.info.setdefault('after_commit_callbacks', []).append(callback)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_after_commit_callbacks(session):
+    for callback in session.info.pop('after_commit_callbacks', []):
+        callback()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_commit_callbacks(session):
+    session.info.pop('after_commit_callbacks', None)
@@ -1,5 +1,6 @@
 from datetime import datetime, time, date
 from .database import db
+from sqlalchemy import event, inspect, select
 import json
 
 
@@ -18,6 +19,10 @@ class Schedule(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_schedules_room_day', 'classroom_id', 'day_of_week', 'is_active'),
+    )
+    
     # Relationships
     course = db.relationship('Course', backref='schedules')
     classroom = db.relationship('Classroom', backref='schedules')
@@ -25,13 +30,7 @@ class Schedule(db.Model):
     @property
     def exclusion_dates_list(self):
         """Get exclusion dates as a list of date objects."""
-        if not self.exclusion_dates:
-            return []
-        try:
-            date_strings = json.loads(self.exclusion_dates)
-            return [datetime.strptime(date_str, '%Y-%m-%d').date() for date_str in date_strings]
-        except (json.JSONDecodeError, ValueError):
-            return []
+        return list(self._parsed_exclusions()[0])
     
     @exclusion_dates_list.setter
     def exclusion_dates_list(self, dates):
@@ -54,12 +53,36 @@ class Schedule(db.Model):
         
         self.exclusion_dates = json.dumps(date_strings) if date_strings else None
     
+    @property
+    def excluded_dates(self):
+        """Exclusion dates as a frozenset, for O(1) membership checks."""
+        return self._parsed_exclusions()[1]
+    
     def is_excluded_date(self, check_date):
         """Check if a specific date is excluded from the schedule."""
         if isinstance(check_date, str):
             check_date = datetime.strptime(check_date, '%Y-%m-%d').date()
         
-        return check_date in self.exclusion_dates_list
+        return check_date in self.excluded_dates
+    
+    def _parsed_exclusions(self):
+        """Parse exclusion_dates once per distinct raw value; returns (dates tuple, frozenset)."""
+        cached = self.__dict__.get('_exclusions_cache')
+        if cached is not None and cached[0] == self.exclusion_dates:
+            return cached[1]
+        
+        dates = _parse_exclusion_dates(self.exclusion_dates)
+        parsed = (dates, frozenset(dates))
+        self._exclusions_cache = (self.exclusion_dates, parsed)
+        return parsed
+    
+    @classmethod
+    def excluded_on(cls, check_date):
+        """Query of active schedules excluded on a date, via the schedule_exclusions index."""
+        return cls.query.join(ScheduleExclusion, ScheduleExclusion.schedule_id == cls.id).filter(
+            ScheduleExclusion.excluded_date == check_date,
+            cls.is_active == True
+        )
     
     def get_day_name(self):
         """Get the day name for the day_of_week."""
@@ -136,4 +159,67 @@ class Schedule(db.Model):
         return errors
     
     def __repr__(self):
-        return f'<Schedule {self.course.course_code} - {self.get_day_name()} {self.get_time_range()}>'
\ No newline at end of file
+        return f'<Schedule {self.course.course_code} - {self.get_day_name()} {self.get_time_range()}>'
+
+
+class ScheduleExclusion(db.Model):
+    """One excluded date of a schedule; kept in step with Schedule.exclusion_dates."""
+    __tablename__ = 'schedule_exclusions'
+    
+    schedule_id = db.Column(db.Integer, db.ForeignKey('schedules.id'), primary_key=True)
+    excluded_date = db.Column(db.Date, primary_key=True, index=True)
+    
+    def __repr__(self):
+        return f'<ScheduleExclusion {self.schedule_id} {self.excluded_date}>'
+
+
+def _parse_exclusion_dates(raw):
+    """Parse the JSON exclusion_dates column into a tuple of dates; invalid data yields ()."""
+    if not raw:
+        return ()
+    try:
+        return tuple(datetime.strptime(date_str, '%Y-%m-%d').date() for date_str in json.loads(raw))
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return ()
+
+
+@event.listens_for(Schedule, 'after_insert')
+def _insert_schedule_exclusions(mapper, connection, target):
+    dates = set(_parse_exclusion_dates(target.exclusion_dates))
+    if dates:
+        connection.execute(ScheduleExclusion.__table__.insert(), [
+            {'schedule_id': target.id, 'excluded_date': excluded_date} for excluded_date in dates
+        ])
+
+
+@event.listens_for(Schedule, 'after_update')
+def _sync_schedule_exclusions(mapper, connection, target):
+    if not inspect(target).attrs.exclusion_dates.history.has_changes():
+        return
+    
+    table = ScheduleExclusion.__table__
+    previous = {
+        row.excluded_date for row in connection.execute(
+            select(table.c.excluded_date).where(table.c.schedule_id == target.id)
+        )
+    }
+    current = set(_parse_exclusion_dates(target.exclusion_dates))
+    
+    removed = previous - current
+    if removed:
+        connection.execute(table.delete().where(
+            table.c.schedule_id == target.id,
+            table.c.excluded_date.in_(removed)
+        ))
+    added = current - previous
+    if added:
+        connection.execute(table.insert(), [
+            {'schedule_id': target.id, 'excluded_date': excluded_date} for excluded_date in added
+        ])
+
+
+@event.listens_for(Schedule, 'before_delete')
+def _delete_schedule_exclusions(mapper, connection, target):
+    # Before the schedule row goes, so the foreign key is never left dangling
+    table = ScheduleExclusion.__table__
+    connection.execute(table.delete().where(table.c.schedule_id == target.id))
@@ -14,7 +14,7 @@ class Student(db.Model):
     phone = db.Column(db.String(15))
     department = db.Column(db.String(100))
     year = db.Column(db.Integer)
-    semester = db.Column(db.Integer, nullable=False, default=1)
+    semester = db.Column(db.Integer, nullable=False, default=1, index=True)
     enrollment_date = db.Column(db.DateTime, default=datetime.utcnow)
     last_semester_update = db.Column(db.DateTime)
     auto_progression_enabled = db.Column(db.Boolean, default=True)
@@ -5,9 +5,10 @@ import qrcode
 import base64
 import random
 from io import BytesIO
+from sqlalchemy.orm import joinedload, contains_eager
 from app.models.user import User
 from app.models.student import Student
-from app.models.course import Course, CourseEnrollment
+from app.models.course import Course
 from app.models.classroom import Classroom, ClassSession
 from app.models.attendance import Attendance
 from app.models.schedule import Schedule
@@ -32,7 +33,7 @@ def dashboard():
     # Get today's attendance data
     today = datetime.utcnow().date()
     today_attendance_count = Attendance.query.filter(
-        Attendance.check_in_time >= today
+        *Attendance.checked_in_between(today, today)
     ).count()
     
     # Calculate attendance metrics (using mock data for demonstration)
@@ -198,8 +199,8 @@ def manage_courses():
     search_query = request.args.get('search', '').strip()
     department_filter = request.args.get('department', '').strip()
     
-    # Base query for active courses
-    query = Course.query.filter_by(is_active=True)
+    # Base query for active courses; the cards show each course's teacher
+    query = Course.query.options(joinedload(Course.teacher)).filter_by(is_active=True)
     
     # Apply filters
     if semester_filter:
@@ -244,14 +245,9 @@ def manage_courses():
         if semester not in courses_by_semester:
             courses_by_semester[semester] = []
         
-        # Get enrollment count for each course
-        enrollment_count = CourseEnrollment.query.filter_by(
-            course_id=course.id, is_active=True
-        ).count()
-        
         course_data = {
             'course': course,
-            'enrollment_count': enrollment_count
+            'enrollment_count': course.active_enrollment_count
         }
         courses_by_semester[semester].append(course_data)
     
@@ -278,8 +274,10 @@ def manage_schedule():
     classrooms = Classroom.query.filter_by(is_active=True).order_by(Classroom.room_number).all()
     courses = Course.query.filter_by(is_active=True).order_by(Course.semester, Course.course_name).all()
     
-    # Get schedules with filters
-    schedule_query = Schedule.query.filter_by(is_active=True)
+    # Get schedules with filters; course and classroom are joined in for the timetable cells
+    schedule_query = Schedule.query.options(
+        joinedload(Schedule.course), joinedload(Schedule.classroom)
+    ).filter_by(is_active=True)
     
     if semester_filter:
         schedule_query = schedule_query.filter_by(semester=semester_filter)
@@ -300,7 +298,9 @@ def manage_schedule():
         timetable[schedule.day_of_week].append(schedule)
     
     # Get class sessions for backward compatibility
-    sessions = ClassSession.query.order_by(ClassSession.session_date.desc(), ClassSession.start_time.desc()).limit(10).all()
+    sessions = ClassSession.query.options(
+        joinedload(ClassSession.course), joinedload(ClassSession.classroom)
+    ).order_by(ClassSession.session_date.desc(), ClassSession.start_time.desc()).limit(10).all()
     
     # Day names for display
     day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -346,14 +346,14 @@ def attendance_records():
     if date_from:
         try:
             from_date = datetime.strptime(date_from, '%Y-%m-%d').date()
-            query = query.filter(db.func.date(Attendance.check_in_time) >= from_date)
+            query = query.filter(*Attendance.checked_in_between(date_from=from_date))
         except ValueError:
             pass
     
     if date_to:
         try:
             to_date = datetime.strptime(date_to, '%Y-%m-%d').date()
-            query = query.filter(db.func.date(Attendance.check_in_time) <= to_date)
+            query = query.filter(*Attendance.checked_in_between(date_to=to_date))
         except ValueError:
             pass
     
@@ -375,8 +375,11 @@ def attendance_records():
     # Order by check-in time descending
     query = query.order_by(Attendance.check_in_time.desc())
     
-    # Paginate results
-    records = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Paginate results, filling each row's student and course from the joins above
+    records = query.options(
+        contains_eager(Attendance.student),
+        contains_eager(Attendance.class_session).contains_eager(ClassSession.course)
+    ).paginate(page=page, per_page=per_page, error_out=False)
     
     # Get filter options
     semester_stats = db.session.query(
@@ -418,23 +421,27 @@ def attendance_records():
         if not date_to:
             date_to = datetime.utcnow().strftime('%Y-%m-%d')
         
+        # Days are the sessions' dates, so the range is read off the session_date
+        # index and only those sessions' attendance is counted
         calendar_query = db.session.query(
-            db.func.date(Attendance.check_in_time).label('date'),
+            ClassSession.session_date.label('date'),
             Attendance.status,
             db.func.count(Attendance.id).label('count')
+        ).select_from(ClassSession).join(
+            Attendance, Attendance.class_session_id == ClassSession.id
         ).filter(
-            db.func.date(Attendance.check_in_time) >= datetime.strptime(date_from, '%Y-%m-%d').date(),
-            db.func.date(Attendance.check_in_time) <= datetime.strptime(date_to, '%Y-%m-%d').date()
+            ClassSession.session_date >= datetime.strptime(date_from, '%Y-%m-%d').date(),
+            ClassSession.session_date <= datetime.strptime(date_to, '%Y-%m-%d').date()
         )
         
         # Apply same filters for calendar
         if semester_filter:
             calendar_query = calendar_query.join(Student, Attendance.student_id == Student.id).filter(Student.semester == semester_filter)
         if course_filter:
-            calendar_query = calendar_query.join(ClassSession, Attendance.class_session_id == ClassSession.id).join(Course, ClassSession.course_id == Course.id).filter(Course.id == course_filter)
+            calendar_query = calendar_query.filter(ClassSession.course_id == course_filter)
         
         calendar_results = calendar_query.group_by(
-            db.func.date(Attendance.check_in_time), Attendance.status
+            ClassSession.session_date, Attendance.status
         ).all()
         
         # Process calendar data
@@ -575,32 +582,26 @@ def add_attendance():
             db.session.add(session)
             db.session.flush()
         
-        # Check if attendance already exists
-        existing_attendance = Attendance.query.filter_by(
-            student_id=student.id,
-            class_session_id=session.id
-        ).first()
-        
-        if existing_attendance:
-            return jsonify({'error': 'Attendance record already exists for this student and session'}), 400
-        
-        # Create attendance record
-        attendance = Attendance(
-            student_id=student.id,
-            class_session_id=session.id,
-            check_in_time=check_in_time,
+        # Create attendance record unless one already exists
+        created, attendance_id, _ = Attendance.record_check_in(
+            student.id,
+            session.id,
+            check_in_time,
             status=data['status'],
             method='manual',
             notes=data.get('notes', '')
         )
         
-        db.session.add(attendance)
+        if not created:
+            db.session.rollback()
+            return jsonify({'error': 'Attendance record already exists for this student and session'}), 400
+        
         db.session.commit()
         
         return jsonify({
             'success': True,
             'message': f'Attendance recorded for {student.full_name}',
-            'attendance_id': attendance.id
+            'attendance_id': attendance_id
         })
         
     except Exception as e:
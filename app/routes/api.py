@@ -1,6 +1,7 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, g, make_response
 from flask_login import login_required, current_user
 from functools import wraps
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 import random
 from app.models.user import User
@@ -10,6 +11,16 @@ from app.models.attendance import Attendance
 from app.models.classroom import Classroom, ClassSession
 from app.models.schedule import Schedule
 from app.models.database import db
+from app.services import (
+    tap_resolver, session_index, enrollment_index, tap_spool, tap_dedup, stage_timings, reader_auth,
+    schedule_index, room_availability, timetable_cache, lazy_load_guard,
+    query_budget, slow_query_log
+)
+from app.services.stage_timing import mark_stage
+from app.services.tap_batch import mark_taps
+from app.services.check_out import CHECK_IN, CHECK_OUT, check_out_window, tap_action
+from app.services.schedule_conflicts import import_schedules, audit_timetable
+from app.services.session_materializer import materialize_session, schedule_slot, sync_schedule_sessions
 
 api = Blueprint('api', __name__)
 
@@ -46,6 +57,40 @@ def create_classroom():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@api.route('/classrooms/available', methods=['GET'])
+@admin_required
+def get_available_classrooms():
+    """Classrooms with no active schedule in a weekly slot, best fit first"""
+    day_of_week = request.args.get('day', type=int)
+    start = request.args.get('start')
+    end = request.args.get('end')
+    min_capacity = request.args.get('min_capacity', type=int)
+    exclude_id = request.args.get('exclude_id', type=int)  # For updates
+
+    if day_of_week is None or not start or not end:
+        return jsonify({'error': 'Missing day, start or end'}), 400
+    if not (0 <= day_of_week <= 6):
+        return jsonify({'error': 'Day of week must be between 0 (Monday) and 6 (Sunday)'}), 400
+
+    try:
+        start_time = datetime.strptime(start, '%H:%M').time()
+        end_time = datetime.strptime(end, '%H:%M').time()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid time format: {str(e)}'}), 400
+    if start_time >= end_time:
+        return jsonify({'error': 'Start time must be before end time'}), 400
+
+    classrooms = room_availability.available(day_of_week, start_time, end_time, min_capacity, exclude_id)
+    return jsonify({
+        'count': len(classrooms),
+        'classrooms': [{
+            'id': classroom.id,
+            'room_number': classroom.room_number,
+            'building': classroom.building,
+            'capacity': classroom.capacity
+        } for classroom in classrooms]
+    })
+
 @api.route('/class-sessions', methods=['POST'])
 @admin_required
 def create_class_session():
@@ -207,11 +252,6 @@ def get_courses():
     
     courses_data = []
     for c in courses:
-        # Get enrollment count
-        enrollment_count = CourseEnrollment.query.filter_by(
-            course_id=c.id, is_active=True
-        ).count()
-        
         courses_data.append({
             'id': c.id,
             'course_code': c.course_code,
@@ -222,7 +262,7 @@ def get_courses():
             'semester': c.semester,
             'teacher': c.teacher.username if c.teacher else None,
             'teacher_id': c.teacher_id,
-            'enrollment_count': enrollment_count,
+            'enrollment_count': c.active_enrollment_count,
             'created_at': c.created_at.isoformat(),
             'is_active': c.is_active
         })
@@ -230,6 +270,8 @@ def get_courses():
     return jsonify(courses_data)
 
 @api.route('/attendance/mark', methods=['POST'])
+@reader_auth.required
+@stage_timings.timed('mark_attendance')
 def mark_attendance():
     """
     Marks attendance for a student based on their NFC tag and the classroom's NFC reader.
@@ -242,77 +284,282 @@ def mark_attendance():
     if not nfc_tag_id or not nfc_reader_id:
         return jsonify({'error': 'Missing nfc_tag_id or nfc_reader_id'}), 400
 
+    # A signed reader may only mark attendance at its own classroom
+    if g.signed_reader_id and g.signed_reader_id != nfc_reader_id:
+        return jsonify({'error': 'Reader authentication failed: reader mismatch'}), 401
+
+    # Repeat taps inside the de-dup window are answered without any lookups
+    if tap_dedup.enabled:
+        remembered = tap_dedup.lookup(nfc_tag_id, nfc_reader_id)
+        mark_stage('dedup')
+        if remembered:
+            payload, status = remembered
+            return jsonify(payload), status
+
     # 1. Find the student by their NFC tag
-    student = Student.query.filter_by(nfc_tag_id=nfc_tag_id).first()
+    student = tap_resolver.resolve_student(nfc_tag_id)
+    mark_stage('student')
     if not student:
         return jsonify({'error': 'Invalid student NFC tag'}), 404
+    student_id, student_name = student
 
     # 2. Find the classroom by the NFC reader ID
-    classroom = Classroom.query.filter_by(nfc_reader_id=nfc_reader_id).first()
+    classroom = tap_resolver.resolve_classroom(nfc_reader_id)
+    mark_stage('classroom')
     if not classroom:
         return jsonify({'error': 'Invalid classroom NFC reader ID'}), 404
+    classroom_id, room_number = classroom
 
-    # 3. Find the active class session in this specific classroom at the current time
+    # 3. Find the class session in this classroom the tap belongs to: the one
+    #    running now or, inside the check-out grace period, one that just ended
     now = datetime.now()
-    current_time = now.time()
-    current_date = now.date()
+    before_end, after_end = check_out_window(current_app.config)
+    candidates = session_index.find_for_tap(classroom_id, now, after_end)
+    if not candidates:
+        # Nothing materialized for today: fall back to the room's schedules
+        candidates = schedule_index.find_for_tap(classroom_id, now, after_end)
+    mark_stage('session')
 
-    class_session = ClassSession.query.filter(
-        ClassSession.classroom_id == classroom.id,
-        ClassSession.session_date == current_date,
-        ClassSession.start_time <= current_time,
-        ClassSession.end_time >= current_time,
-        ClassSession.is_active == True
-    ).first()
+    if not candidates:
+        return jsonify({'error': f'No active class session found in classroom {room_number} at this time'}), 404
 
+    # 4. Verify the student is enrolled in the course for this session
+    class_session = next(
+        (slot for slot in candidates if enrollment_index.is_enrolled(student_id, slot.course_id)), None
+    )
+    mark_stage('enrollment')
     if not class_session:
-        return jsonify({'error': f'No active class session found in classroom {classroom.room_number} at this time'}), 404
+        return jsonify({'error': f'Access denied: Student {student_name} is not enrolled in {candidates[0].course_name}.'}), 403
 
-    # 4. Verify the student is enrolled in the course for this session
-    is_enrolled = CourseEnrollment.query.filter_by(
-        student_id=student.id,
-        course_id=class_session.course_id,
-        is_active=True
-    ).first()
-
-    if not is_enrolled:
-        return jsonify({'error': f'Access denied: Student {student.full_name} is not enrolled in {class_session.course.course_name}.'}), 403
-
-    # 5. Check if attendance has already been marked
-    existing_attendance = Attendance.query.filter_by(
-        student_id=student.id,
-        class_session_id=class_session.id
-    ).first()
-
-    if existing_attendance:
-        return jsonify({
-            'message': 'Attendance already marked for this session',
-            'student_name': student.full_name,
-            'check_in_time': existing_attendance.check_in_time.isoformat()
-        }), 200
+    # A scheduled slot with no session yet gets one, created once however many taps race for it
+    if class_session.id is None:
+        try:
+            class_session = materialize_session(classroom_id, now.date(), class_session)
+            db.session.commit()
+            mark_stage('materialize')
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': f'Database error: {str(e)}'}), 500
+        if not class_session:
+            return jsonify({'error': f'No active class session found in classroom {room_number} at this time'}), 404
+
+    # 5. Near the end of the session a tap is a check-out: one UPDATE of the
+    #    student's row. Before end_time a student with no check-in falls through
+    #    to step 6; after it there is nothing left to check in to.
+    action = tap_action(now, class_session.end_time, before_end, after_end)
+    if action != CHECK_IN:
+        try:
+            checked_out = Attendance.record_check_out(student_id, class_session.id, now)
+            mark_stage('check_out')
+            if checked_out:
+                db.session.commit()
+                mark_stage('commit')
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+        if checked_out:
+            response = {
+                'message': 'Check-out recorded successfully',
+                'student_name': student_name,
+                'course': class_session.course_name,
+                'classroom': room_number,
+                'check_out_time': now.isoformat()
+            }
+            if tap_dedup.enabled:
+                tap_dedup.remember(nfc_tag_id, nfc_reader_id, {
+                    'message': 'Check-out already recorded for this session',
+                    'student_name': student_name,
+                    'check_out_time': now.isoformat()
+                }, 200)
+            return jsonify(response), 200
+
+        # No open check-in: either the student already checked out, or has no row
+        checked_out_at = db.session.query(Attendance.check_out_time).filter_by(
+            student_id=student_id, class_session_id=class_session.id
+        ).scalar()
+        if checked_out_at is not None:
+            already_checked_out = {
+                'message': 'Check-out already recorded for this session',
+                'student_name': student_name,
+                'check_out_time': checked_out_at.isoformat()
+            }
+            if tap_dedup.enabled:
+                tap_dedup.remember(nfc_tag_id, nfc_reader_id, already_checked_out, 200)
+            return jsonify(already_checked_out), 200
+        if action == CHECK_OUT:
+            return jsonify({'error': f'No open check-in to close for {student_name} in {class_session.course_name}'}), 404
+
+    # 6. In write-behind mode, queue the check-in on the local spool;
+    #    otherwise record it, where a repeat tap is a no-op returning the original check-in.
+    queued = False
+    if tap_spool.enabled:
+        # A repeat tap gets the original check-in, still queued or already drained
+        check_in_time = tap_spool.pending_check_in(student_id, class_session.id) or db.session.query(
+            Attendance.check_in_time
+        ).filter_by(student_id=student_id, class_session_id=class_session.id).scalar()
+        if check_in_time is not None:
+            created, queued = False, True
+        else:
+            try:
+                created, check_in_time = tap_spool.append(student_id, class_session.id, now, method='nfc_card')
+                queued = True
+                mark_stage('spool')
+            except OSError as e:
+                current_app.logger.warning('Tap spool append failed, writing directly: %s', e)
+
+    if not queued:
+        try:
+            created, attendance_id, check_in_time = Attendance.record_check_in(
+                student_id, class_session.id, now, method='nfc_card'
+            )
+            mark_stage('upsert')
+            db.session.commit()
+            mark_stage('commit')
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+    already_marked = {
+        'message': 'Attendance already marked for this session',
+        'student_name': student_name,
+        'check_in_time': check_in_time.isoformat()
+    }
+    if tap_dedup.enabled:
+        tap_dedup.remember(nfc_tag_id, nfc_reader_id, already_marked, 200)
+
+    if not created:
+        return jsonify(already_marked), 200
+
+    return jsonify({
+        'message': 'Attendance queued' if queued else 'Attendance marked successfully',
+        'student_name': student_name,
+        'course': class_session.course_name,
+        'classroom': room_number,
+        'check_in_time': check_in_time.isoformat()
+    }), 202 if queued else 201
+
+@api.route('/attendance/mark-batch', methods=['POST'])
+@reader_auth.required
+def mark_attendance_batch():
+    """
+    Marks attendance for taps buffered by a reader gateway.
+    Expects a JSON array (or an object with an 'events' array) of
+    {'nfc_tag_id', 'nfc_reader_id', 'tapped_at'} events, and returns
+    one result per event in the same order. A signed reader may only
+    submit taps for itself; other readers' events are rejected.
+    """
+    data = request.json
+    events = data.get('events') if isinstance(data, dict) else data
+
+    if not isinstance(events, list) or not events:
+        return jsonify({'error': 'Expected a non-empty array of tap events'}), 400
+
+    max_events = current_app.config['TAP_BATCH_MAX_EVENTS']
+    if len(events) > max_events:
+        return jsonify({'error': f'Batch exceeds the limit of {max_events} events'}), 413
 
-    # 6. Record the attendance
     try:
-        new_attendance = Attendance(
-            student_id=student.id,
-            class_session_id=class_session.id,
-            check_in_time=now,
-            method='nfc_card'
-        )
-        db.session.add(new_attendance)
-        db.session.commit()
+        results = mark_taps(events, reader_id=g.signed_reader_id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
 
-        return jsonify({
-            'message': 'Attendance marked successfully',
-            'student_name': student.full_name,
-            'course': class_session.course.course_name,
-            'classroom': classroom.room_number,
-            'check_in_time': now.isoformat()
-        }), 201
+    summary = {'marked': 0, 'checked_out': 0, 'already_marked': 0, 'rejected': 0}
+    for result in results:
+        summary[result['status']] += 1
+
+    return jsonify({
+        'results': results,
+        'summary': summary
+    }), 200
+
+@api.route('/readers/<nfc_reader_id>/offline-log', methods=['POST'])
+@reader_auth.required
+def upload_offline_log(nfc_reader_id):
+    """
+    Replays taps a reader logged while it was offline.
+    Expects a JSON object with an 'events' array of [nfc_tag_id, tapped_at] pairs
+    (or {'nfc_tag_id', 'tapped_at'} objects). Each tap is attributed to the
+    session that was running in the reader's classroom at its tapped_at time.
+    """
+    data = request.json
+    events = data.get('events') if isinstance(data, dict) else None
+
+    if not isinstance(events, list) or not events:
+        return jsonify({'error': 'Expected a non-empty events array'}), 400
+
+    max_events = current_app.config['OFFLINE_LOG_MAX_EVENTS']
+    if len(events) > max_events:
+        return jsonify({'error': f'Upload exceeds the limit of {max_events} events'}), 413
+
+    if not tap_resolver.resolve_classroom(nfc_reader_id):
+        return jsonify({'error': 'Invalid classroom NFC reader ID'}), 404
+
+    taps = []
+    for event in events:
+        if isinstance(event, (list, tuple)) and len(event) == 2:
+            taps.append({'nfc_tag_id': event[0], 'nfc_reader_id': nfc_reader_id, 'tapped_at': event[1]})
+        elif isinstance(event, dict):
+            taps.append(dict(event, nfc_reader_id=nfc_reader_id))
+        else:
+            taps.append(None)
+
+    try:
+        results = mark_taps(taps, method='nfc_offline')
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
 
+    summary = {'marked': 0, 'checked_out': 0, 'already_marked': 0, 'rejected': 0}
+    rejected = []
+    for i, result in enumerate(results):
+        summary[result['status']] += 1
+        if result['status'] == 'rejected':
+            rejected.append({'index': i, 'code': result['code'], 'error': result['error']})
+
+    return jsonify({
+        'nfc_reader_id': nfc_reader_id,
+        'summary': summary,
+        'rejected': rejected
+    }), 200
+
+@api.route('/metrics', methods=['GET'])
+@admin_required
+def get_metrics():
+    """Get counters for the NFC tap path caches and its per-stage latency histograms"""
+    return jsonify({
+        'tap_resolver': tap_resolver.stats(),
+        'session_index': session_index.stats(),
+        'enrollment_index': enrollment_index.stats(),
+        'tap_spool': tap_spool.stats(),
+        'tap_dedup': tap_dedup.stats(),
+        'stage_timings': stage_timings.stats(),
+        'reader_auth': reader_auth.stats(),
+        'schedule_index': schedule_index.stats(),
+        'room_availability': room_availability.stats(),
+        'timetable_cache': timetable_cache.stats(),
+        'lazy_load_guard': lazy_load_guard.stats(),
+        'query_budget': query_budget.stats(),
+        'slow_query_log': slow_query_log.stats()
+    })
+
+
+@api.route('/slow-queries', methods=['GET'])
+@admin_required
+def get_slow_queries():
+    """Get the most recent entries of the slow query log, optionally for one endpoint"""
+    if not slow_query_log.enabled:
+        return jsonify({'error': 'Slow query log is not enabled'}), 404
+
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    entries = slow_query_log.recent(limit=limit, endpoint=request.args.get('endpoint') or None)
+    return jsonify({
+        'threshold_ms': current_app.config.get('SLOW_QUERY_THRESHOLD_MS', 100),
+        'count': len(entries),
+        'entries': entries
+    })
+
 
 @api.route('/students/progression-eligible', methods=['GET'])
 @admin_required
@@ -670,7 +917,7 @@ def get_dashboard_data():
     # Get today's attendance data
     today = datetime.utcnow().date()
     today_attendance_count = Attendance.query.filter(
-        Attendance.check_in_time >= today
+        *Attendance.checked_in_between(today, today)
     ).count()
     
     # Calculate attendance metrics (using mock data for demonstration)
@@ -750,7 +997,9 @@ def get_schedules():
     classroom_id = request.args.get('classroom_id', type=int)
     day_of_week = request.args.get('day_of_week', type=int)
     
-    query = Schedule.query.filter_by(is_active=True)
+    query = Schedule.query.options(
+        joinedload(Schedule.course), joinedload(Schedule.classroom)
+    ).filter_by(is_active=True)
     
     # Apply filters
     if semester:
@@ -822,6 +1071,8 @@ def create_schedule():
             return jsonify({'error': 'Validation failed', 'details': validation_errors}), 400
         
         db.session.add(schedule)
+        db.session.flush()
+        sync_schedule_sessions([(None, schedule_slot(schedule))])
         db.session.commit()
         
         return jsonify({
@@ -838,6 +1089,61 @@ def create_schedule():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@api.route('/schedules/bulk-import', methods=['POST'])
+@admin_required
+def bulk_import_schedules():
+    """
+    Import a term's schedules in one request.
+    Expects a JSON object with a 'schedules' array of create_schedule payloads and
+    an optional 'dry_run' flag. Entries are checked against each other and against
+    existing active schedules; nothing is saved unless all of them are valid.
+    """
+    data = request.json
+    entries = data.get('schedules') if isinstance(data, dict) else None
+
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'Expected a non-empty schedules array'}), 400
+
+    max_entries = current_app.config['SCHEDULE_IMPORT_MAX_ENTRIES']
+    if len(entries) > max_entries:
+        return jsonify({'error': f'Import exceeds the limit of {max_entries} schedules'}), 413
+
+    dry_run = bool(data.get('dry_run'))
+    try:
+        schedule_ids, errors, conflicts = import_schedules(entries, dry_run=dry_run)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    if errors or conflicts:
+        return jsonify({
+            'error': 'Validation failed',
+            'errors': errors,
+            'conflicts': conflicts
+        }), 400
+
+    if dry_run:
+        return jsonify({
+            'message': f'{len(entries)} schedules can be imported',
+            'errors': [],
+            'conflicts': []
+        }), 200
+
+    return jsonify({
+        'message': f'Successfully imported {len(schedule_ids)} schedules',
+        'created_count': len(schedule_ids),
+        'schedule_ids': schedule_ids
+    }), 201
+
+@api.route('/schedules/audit', methods=['GET'])
+@admin_required
+def audit_schedules():
+    """Report room, teacher and student clashes across the whole active timetable"""
+    try:
+        return jsonify(audit_timetable())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @api.route('/schedules/<int:schedule_id>', methods=['GET'])
 @admin_required
 def get_schedule_details(schedule_id):
@@ -870,6 +1176,7 @@ def get_schedule_details(schedule_id):
 def update_schedule(schedule_id):
     """Update an existing schedule"""
     schedule = Schedule.query.get_or_404(schedule_id)
+    previous = schedule_slot(schedule)
     data = request.json
     
     try:
@@ -897,6 +1204,7 @@ def update_schedule(schedule_id):
             return jsonify({'error': 'Validation failed', 'details': validation_errors}), 400
         
         schedule.updated_at = datetime.utcnow()
+        sync_schedule_sessions([(previous, schedule_slot(schedule))])
         db.session.commit()
         
         return jsonify({
@@ -917,8 +1225,10 @@ def delete_schedule(schedule_id):
     schedule = Schedule.query.get_or_404(schedule_id)
     
     try:
+        previous = schedule_slot(schedule)
         schedule.is_active = False
         schedule.updated_at = datetime.utcnow()
+        sync_schedule_sessions([(previous, None)])
         db.session.commit()
         
         return jsonify({
@@ -982,38 +1292,13 @@ def get_timetable():
     semester = request.args.get('semester', type=int)
     classroom_id = request.args.get('classroom_id', type=int)
     
-    query = Schedule.query.filter_by(is_active=True)
-    
-    if semester:
-        query = query.filter_by(semester=semester)
-    if classroom_id:
-        query = query.filter_by(classroom_id=classroom_id)
-    
-    schedules = query.order_by(Schedule.day_of_week, Schedule.start_time).all()
-    
-    # Organize by day of week
-    timetable = {i: [] for i in range(7)}  # 0=Monday to 6=Sunday
+    timetable, etag = timetable_cache.get(semester, classroom_id)
     
-    for schedule in schedules:
-        timetable[schedule.day_of_week].append({
-            'id': schedule.id,
-            'course_code': schedule.course.course_code,
-            'course_name': schedule.course.course_name,
-            'classroom_name': schedule.classroom.room_number,
-            'start_time': schedule.start_time.strftime('%H:%M'),
-            'end_time': schedule.end_time.strftime('%H:%M'),
-            'time_range': schedule.get_time_range(),
-            'semester': schedule.semester,
-            'exclusion_dates_count': len(schedule.exclusion_dates_list)
-        })
-    
-    # Get day names
-    day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    
-    return jsonify({
-        'timetable': timetable,
-        'day_names': day_names
-    })
+    # Pollers send If-None-Match and get an empty 304 until a schedule changes
+    response = make_response(jsonify(timetable))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 @api.route('/schedules/bulk-delete', methods=['POST'])
 @admin_required
@@ -1026,11 +1311,20 @@ def bulk_delete_schedules():
         return jsonify({'error': 'No schedule IDs provided'}), 400
     
     try:
+        previous = [schedule_slot(schedule) for schedule in Schedule.query.filter(
+            Schedule.id.in_(schedule_ids),
+            Schedule.is_active == True
+        )]
         updated_count = Schedule.query.filter(
             Schedule.id.in_(schedule_ids)
         ).update({'is_active': False, 'updated_at': datetime.utcnow()}, synchronize_session=False)
         
+        sync_schedule_sessions([(slot, None) for slot in previous])
         db.session.commit()
+        # Bulk updates skip the mapper events that normally drop these indexes
+        schedule_index.clear()
+        room_availability.invalidate()
+        timetable_cache.invalidate()
         
         return jsonify({
             'message': f'Successfully deactivated {updated_count} schedules',
@@ -1,11 +1,13 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 import qrcode
 import base64
 from io import BytesIO
 from app.models.student import Student
 from app.models.attendance import Attendance
 from app.models.course import CourseEnrollment
+from app.models.classroom import ClassSession
 from app.models.database import db
 
 student = Blueprint('student', __name__)
@@ -21,11 +23,13 @@ def require_student():
 def dashboard():
     student_profile = Student.query.filter_by(user_id=current_user.id).first_or_404()
 
-    recent_attendance = Attendance.query.filter_by(
+    recent_attendance = Attendance.query.options(
+        joinedload(Attendance.class_session).joinedload(ClassSession.course)
+    ).filter_by(
         student_id=student_profile.id
     ).order_by(Attendance.check_in_time.desc()).limit(10).all()
 
-    enrolled_courses = CourseEnrollment.query.filter_by(
+    enrolled_courses = CourseEnrollment.query.options(joinedload(CourseEnrollment.course)).filter_by(
         student_id=student_profile.id, is_active=True
     ).all()
 
@@ -41,7 +45,9 @@ def attendance_history():
     page = request.args.get('page', 1, type=int)
     per_page = 20
     
-    attendance_query = Attendance.query.filter_by(
+    attendance_query = Attendance.query.options(
+        joinedload(Attendance.class_session).joinedload(ClassSession.course)
+    ).filter_by(
         student_id=student_profile.id
     ).order_by(Attendance.check_in_time.desc())
     
@@ -57,7 +63,7 @@ def attendance_history():
 def courses():
     student_profile = Student.query.filter_by(user_id=current_user.id).first_or_404()
     
-    enrolled_courses = CourseEnrollment.query.filter_by(
+    enrolled_courses = CourseEnrollment.query.options(joinedload(CourseEnrollment.course)).filter_by(
         student_id=student_profile.id, is_active=True
     ).all()
     
@@ -0,0 +1,52 @@
+from .tap_resolver import tap_resolver, TapResolver
+from .session_index import session_index, SessionIndex, SessionSlot
+from .enrollment_index import enrollment_index, EnrollmentIndex
+from .tap_spool import tap_spool, TapSpool
+from .tap_dedup import tap_dedup, TapDedupWindow
+from .stage_timing import stage_timings, StageTimings
+from .reader_auth import reader_auth, ReaderAuth
+from .session_materializer import (
+    materialize_sessions, materialize_session, sync_schedule_sessions, schedule_slot, ScheduleSlot
+)
+from .schedule_index import schedule_index, ScheduleIndex
+from .room_availability import room_availability, RoomAvailabilityIndex
+from .timetable_cache import timetable_cache, TimetableCache
+from .lazy_load_guard import lazy_load_guard, LazyLoadGuard, LazyLoadError
+from .query_budget import query_budget, QueryBudget
+from .slow_query_log import slow_query_log, SlowQueryLog
+
+__all__ = [
+    'tap_resolver',
+    'TapResolver',
+    'session_index',
+    'SessionIndex',
+    'SessionSlot',
+    'enrollment_index',
+    'EnrollmentIndex',
+    'tap_spool',
+    'TapSpool',
+    'tap_dedup',
+    'TapDedupWindow',
+    'stage_timings',
+    'StageTimings',
+    'reader_auth',
+    'ReaderAuth',
+    'materialize_sessions',
+    'materialize_session',
+    'sync_schedule_sessions',
+    'schedule_slot',
+    'ScheduleSlot',
+    'schedule_index',
+    'ScheduleIndex',
+    'room_availability',
+    'RoomAvailabilityIndex',
+    'timetable_cache',
+    'TimetableCache',
+    'lazy_load_guard',
+    'LazyLoadGuard',
+    'LazyLoadError',
+    'query_budget',
+    'QueryBudget',
+    'slow_query_log',
+    'SlowQueryLog'
+]
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+
+# What a tap on a session means, depending on when it happens
+CHECK_IN = 'check_in'
+CHECK_OUT_OR_IN = 'check_out_or_in'
+CHECK_OUT = 'check_out'
+
+
+def check_out_window(config):
+    """(before_end, after_end) timedeltas of the check-out window from CHECK_OUT_WINDOW_* minutes."""
+    return (
+        timedelta(minutes=config.get('CHECK_OUT_WINDOW_BEFORE_END', 0)),
+        timedelta(minutes=config.get('CHECK_OUT_WINDOW_AFTER_END', 0))
+    )
+
+
+def tap_action(tapped_at, end_time, before_end, after_end):
+    """
+    Decide what a tap at `tapped_at` on a session ending at `end_time` does.
+
+    Before the check-out window it is a CHECK_IN. Inside the window but before
+    the end it is CHECK_OUT_OR_IN: it closes the student's open check-in, or
+    checks them in if they have none. After the end it is CHECK_OUT only, so a
+    student who never checked in cannot be marked present once class is over.
+    """
+    if not (before_end or after_end):
+        return CHECK_IN
+    ends_at = datetime.combine(tapped_at.date(), end_time)
+    if tapped_at < ends_at - before_end:
+        return CHECK_IN
+    if tapped_at < ends_at:
+        return CHECK_OUT_OR_IN
+    return CHECK_OUT
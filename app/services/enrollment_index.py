@@ -0,0 +1,144 @@
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+from app.models.database import db, run_after_commit
+from app.models.course import CourseEnrollment
+
+
+class EnrollmentIndex:
+    """
+    Active course enrollments held as one sorted int array of student ids per
+    course, answering "is student S actively enrolled in course C" with a
+    binary search and no SQL.
+
+    The arrays are loaded with a single query on first use and then maintained
+    incrementally from CourseEnrollment inserts, updates and deletes once their
+    transaction commits. Bulk query.update() calls bypass those events and must
+    call clear() themselves. Writes made by other processes are not seen by the
+    events, so the arrays are reloaded ENROLLMENT_INDEX_TTL_SECONDS after they
+    were built.
+    """
+
+    TYPECODE = 'i'
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._courses = None
+        self._expires_at = None
+        self._lock = threading.Lock()
+        self._counters = {
+            'lookups': 0,
+            'rebuilds': 0,
+            'incremental_updates': 0
+        }
+
+    def init_app(self, app):
+        self.ttl = app.config.get('ENROLLMENT_INDEX_TTL_SECONDS', self.ttl)
+        self.clear()
+
+    def is_enrolled(self, student_id, course_id):
+        with self._lock:
+            if self._courses is None or (self._expires_at is not None and time.monotonic() >= self._expires_at):
+                self._build()
+            self._counters['lookups'] += 1
+            students = self._courses.get(course_id)
+            if not students:
+                return False
+            i = bisect_left(students, student_id)
+            return i < len(students) and students[i] == student_id
+
+    def add(self, student_id, course_id):
+        with self._lock:
+            if self._courses is None:
+                return
+            students = self._courses.setdefault(course_id, array(self.TYPECODE))
+            i = bisect_left(students, student_id)
+            if i == len(students) or students[i] != student_id:
+                students.insert(i, student_id)
+            self._counters['incremental_updates'] += 1
+
+    def remove(self, student_id, course_id):
+        with self._lock:
+            if self._courses is None:
+                return
+            students = self._courses.get(course_id)
+            if students:
+                i = bisect_left(students, student_id)
+                if i < len(students) and students[i] == student_id:
+                    del students[i]
+            self._counters['incremental_updates'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._courses = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            courses = self._courses or {}
+            entries = sum(len(students) for students in courses.values())
+            array_bytes = sum(sys.getsizeof(students) for students in courses.values())
+            stats['loaded'] = self._courses is not None
+            stats['courses'] = len(courses)
+            stats['enrollments'] = entries
+            stats['memory_bytes'] = array_bytes + sys.getsizeof(courses)
+        itemsize = array(self.TYPECODE).itemsize
+        stats['bytes_per_10k_student_roster'] = sys.getsizeof(array(self.TYPECODE)) + itemsize * 10000
+        return stats
+
+    def _build(self):
+        # Called with the lock held so incremental updates that commit during
+        # the load are applied after it, never lost underneath it.
+        rows = db.session.query(
+            CourseEnrollment.course_id, CourseEnrollment.student_id
+        ).filter(
+            CourseEnrollment.is_active == True
+        ).order_by(CourseEnrollment.course_id, CourseEnrollment.student_id).all()
+
+        courses = {}
+        for course_id, student_id in rows:
+            courses.setdefault(course_id, array(self.TYPECODE)).append(student_id)
+        self._courses = courses
+        self._expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._counters['rebuilds'] += 1
+
+
+enrollment_index = EnrollmentIndex()
+
+
+def _sync_after_commit(target, active):
+    state = inspect(target)
+    current = (target.student_id, target.course_id)
+    previous = {
+        (student_id, course_id)
+        for student_id in (state.attrs.student_id.history.deleted or [target.student_id])
+        for course_id in (state.attrs.course_id.history.deleted or [target.course_id])
+    }
+    previous.discard(current)
+
+    def apply():
+        for student_id, course_id in previous:
+            enrollment_index.remove(student_id, course_id)
+        if active:
+            enrollment_index.add(*current)
+        else:
+            enrollment_index.remove(*current)
+
+    session = object_session(target)
+    if session is not None:
+        run_after_commit(session, apply)
+
+
+@event.listens_for(CourseEnrollment, 'after_insert')
+@event.listens_for(CourseEnrollment, 'after_update')
+def _enrollment_saved(mapper, connection, target):
+    _sync_after_commit(target, bool(target.is_active))
+
+
+@event.listens_for(CourseEnrollment, 'after_delete')
+def _enrollment_deleted(mapper, connection, target):
+    _sync_after_commit(target, False)
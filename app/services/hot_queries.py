@@ -0,0 +1,104 @@
+from collections import namedtuple
+from datetime import date, timedelta
+from sqlalchemy import select, func, text
+from app.models.database import db
+from app.models.attendance import Attendance
+from app.models.classroom import ClassSession
+from app.models.course import CourseEnrollment
+from app.models.student import Student
+from app.models.schedule import Schedule
+from .slow_query_log import EXPLAIN_PREFIXES
+
+
+HotQuery = namedtuple('HotQuery', ['name', 'index', 'build'])
+
+# Representative statements of the hot paths, each with the index it should use
+HOT_QUERIES = [
+    HotQuery(
+        'attendance checked in over a date range (dashboard, attendance records)',
+        'ix_attendance_records_check_in_time',
+        lambda: select(Attendance.id).where(*Attendance.checked_in_between(date.today() - timedelta(days=30), date.today()))
+    ),
+    HotQuery(
+        'attendance per day and status over a date range (attendance calendar)',
+        'ix_class_sessions_date',
+        lambda: select(ClassSession.session_date, Attendance.status, func.count(Attendance.id)).select_from(
+            ClassSession
+        ).join(Attendance, Attendance.class_session_id == ClassSession.id).where(
+            ClassSession.session_date.between(date.today() - timedelta(days=30), date.today())
+        ).group_by(ClassSession.session_date, Attendance.status)
+    ),
+    HotQuery(
+        "a classroom's sessions on a date (session index refresh)",
+        'ix_class_sessions_room_date',
+        lambda: select(ClassSession.id, ClassSession.start_time).where(
+            ClassSession.classroom_id.in_([1, 2]),
+            ClassSession.session_date == date.today()
+        ).order_by(ClassSession.start_time)
+    ),
+    HotQuery(
+        "a course's active enrollments (enrollment counts, timetable audit)",
+        'ix_course_enrollments_course_active',
+        lambda: select(CourseEnrollment.student_id).where(
+            CourseEnrollment.course_id == 1,
+            CourseEnrollment.is_active == True
+        )
+    ),
+    HotQuery(
+        'students of a semester (student lists, progression)',
+        'ix_students_semester',
+        lambda: select(Student.id).where(Student.semester == 1)
+    ),
+    HotQuery(
+        "a classroom's active schedules on a weekday (conflict checks, free rooms)",
+        'ix_schedules_room_day',
+        lambda: select(Schedule.id).where(
+            Schedule.classroom_id == 1,
+            Schedule.day_of_week == 0,
+            Schedule.is_active == True
+        )
+    )
+]
+
+
+def missing_indexes():
+    """Indexes declared on the models that the database does not have yet."""
+    inspector = db.inspect(db.engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return sorted(missing, key=lambda index: index.name)
+
+
+def create_missing_indexes():
+    """Create every index missing_indexes() reports and commit; returns them."""
+    missing = missing_indexes()
+    for index in missing:
+        index.create(db.session.connection())
+    db.session.commit()
+    return missing
+
+
+def explain(statement):
+    """Plan lines for a statement, from EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (PostgreSQL)."""
+    engine = db.engine
+    prefix = EXPLAIN_PREFIXES.get(engine.dialect.name)
+    if prefix is None:
+        return [f'EXPLAIN is not supported on {engine.dialect.name}']
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(text(prefix + sql)).all()
+    if engine.dialect.name == 'sqlite':
+        return [row.detail for row in rows]
+    return [row[0] for row in rows]
+
+
+def analyze():
+    """Refresh planner statistics for every table."""
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    # Pooled SQLite connections keep planning with the schema and statistics
+    # they loaded when they opened, so start over with fresh ones
+    db.engine.dispose()
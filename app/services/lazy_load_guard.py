@@ -0,0 +1,70 @@
+import threading
+from flask import g, request, current_app, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class LazyLoadError(RuntimeError):
+    """Raised in LAZY_LOAD_GUARD='raise' mode when a template lazy-loads a relationship."""
+
+
+class LazyLoadGuard:
+    """
+    Development check for N+1 queries: while a template is rendering, any
+    relationship lazy load that has to hit the database is logged as a warning
+    (LAZY_LOAD_GUARD='warn') or raised as LazyLoadError (LAZY_LOAD_GUARD='raise').
+    Views should load what their templates need with joinedload/selectinload.
+    Relationships already in the identity map, and lazy='dynamic' queries,
+    are not lazy loads and pass through.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listening = False
+        self._violations = {}
+
+    def init_app(self, app):
+        if app.config.get('LAZY_LOAD_GUARD') not in ('warn', 'raise'):
+            return
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        with self._lock:
+            if not self._listening:
+                event.listen(Session, 'do_orm_execute', self._check_execute)
+                self._listening = True
+
+    def stats(self):
+        with self._lock:
+            return {'violations': dict(self._violations)}
+
+    @staticmethod
+    def _render_started(sender, template, context, **extra):
+        g.lazy_load_template = template.name or '<string>'
+
+    @staticmethod
+    def _render_finished(sender, template, context, **extra):
+        g.pop('lazy_load_template', None)
+
+    def _check_execute(self, orm_execute_state):
+        if not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None:
+            return
+        if not has_request_context():
+            return
+        template = g.get('lazy_load_template')
+        if template is None:
+            return
+
+        loaded_from = orm_execute_state.lazy_loaded_from.class_.__name__
+        loaded = ', '.join(mapper.class_.__name__ for mapper in orm_execute_state.all_mappers)
+        key = f'{template}: {loaded_from} -> {loaded}'
+        with self._lock:
+            self._violations[key] = self._violations.get(key, 0) + 1
+
+        message = (f'Lazy load of {loaded} from {loaded_from} while rendering {template} '
+                   f'({request.endpoint}); add a joinedload/selectinload option to the view')
+        if current_app.config.get('LAZY_LOAD_GUARD') == 'raise':
+            raise LazyLoadError(message)
+        current_app.logger.warning(message)
+
+
+lazy_load_guard = LazyLoadGuard()
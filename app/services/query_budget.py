@@ -0,0 +1,132 @@
+import re
+import threading
+from flask import g, request, current_app, has_app_context
+from app.models.database import db, time_cursor_executes
+
+
+# IN lists expanded to one placeholder per value collapse to a single shape
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """Normalize a parameterized SQL statement so repeated executions compare equal."""
+    return _PLACEHOLDER_LIST.sub('(?)', _WHITESPACE.sub(' ', statement).strip())
+
+
+class RequestQueryStats:
+    """Statements run while serving one request."""
+
+    def __init__(self, repeat_threshold):
+        self.repeat_threshold = repeat_threshold
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = {}
+
+    def record(self, statement, parameters, duration, executemany=False):
+        self.count += 1
+        self.duration += duration
+        # Batched statements are not N+1 loops, and their parameter lists can be
+        # the whole batch on every call, so they are not fingerprinted
+        if executemany:
+            return
+        shape = statement_shape(statement)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            entry = self.shapes[shape] = [0, set()]
+        entry[0] += 1
+        # Parameter sets are only counted until the shape gets flagged
+        if len(entry[1]) <= self.repeat_threshold:
+            entry[1].add(repr(parameters))
+
+    def repeated(self):
+        """(shape, executions, parameter sets) for shapes run with more than repeat_threshold parameter sets."""
+        return [
+            (shape, executions, len(parameter_sets))
+            for shape, (executions, parameter_sets) in self.shapes.items()
+            if len(parameter_sets) > self.repeat_threshold
+        ]
+
+
+class QueryBudget:
+    """
+    Counts the SQL statements and database time of every request through
+    cursor execute events. Requests over SQL_QUERY_BUDGET statements or
+    SQL_TIME_BUDGET_MS milliseconds are logged, as is any statement shape that
+    ran with more than SQL_REPEAT_THRESHOLD different parameter sets (the
+    usual sign of an N+1 loop). With SQL_STATS_HEADERS the totals are also
+    returned in X-SQL-* response headers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            'requests': 0,
+            'over_budget': 0,
+            'repeated_statements': 0
+        }
+        self._worst = {}
+
+    def init_app(self, app):
+        if not app.config.get('SQL_BUDGET_ENABLED'):
+            return
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        with app.app_context():
+            time_cursor_executes(db.engine, self._statement_finished)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['max_queries_by_endpoint'] = dict(self._worst)
+        return stats
+
+    @staticmethod
+    def _start_request():
+        g.sql_stats = RequestQueryStats(current_app.config.get('SQL_REPEAT_THRESHOLD', 10))
+
+    @staticmethod
+    def _statement_finished(conn, statement, parameters, executemany, seconds):
+        if not has_app_context():
+            return
+        stats = g.get('sql_stats')
+        if stats is not None:
+            stats.record(statement, parameters, seconds, executemany)
+
+    def _finish_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        config = current_app.config
+        duration_ms = stats.duration * 1000
+        endpoint = request.endpoint or request.path
+        repeated = stats.repeated()
+        over_budget = (stats.count > config.get('SQL_QUERY_BUDGET', 30) or
+                       duration_ms > config.get('SQL_TIME_BUDGET_MS', 500))
+
+        with self._lock:
+            self._counters['requests'] += 1
+            self._counters['over_budget'] += over_budget
+            self._counters['repeated_statements'] += len(repeated)
+            self._worst[endpoint] = max(self._worst.get(endpoint, 0), stats.count)
+
+        if over_budget:
+            current_app.logger.warning(
+                f'{request.method} {request.path} ({endpoint}) ran {stats.count} SQL statements '
+                f'taking {duration_ms:.1f}ms, over budget'
+            )
+        for shape, executions, parameter_sets in repeated:
+            current_app.logger.warning(
+                f'Possible N+1 in {endpoint}: statement ran {executions} times with '
+                f'{parameter_sets}+ parameter sets: {shape[:300]}'
+            )
+
+        if config.get('SQL_STATS_HEADERS'):
+            response.headers['X-SQL-Query-Count'] = str(stats.count)
+            response.headers['X-SQL-Time-Ms'] = f'{duration_ms:.3f}'
+            response.headers['X-SQL-Repeated-Statements'] = str(len(repeated))
+        return response
+
+
+query_budget = QueryBudget()
@@ -0,0 +1,149 @@
+import hashlib
+import hmac
+import string
+import threading
+import time
+from collections import deque
+from functools import wraps
+from flask import request, jsonify, g, current_app
+
+
+def derive_reader_key(master_key, nfc_reader_id):
+    """Per-reader signing key: HMAC-SHA256(NFC_API_KEY, 'nfc-reader:' + reader id)."""
+    return hmac.new(master_key.encode(), f'nfc-reader:{nfc_reader_id}'.encode(), hashlib.sha256).digest()
+
+
+def sign_request(key, timestamp, nonce, body):
+    """Hex HMAC-SHA256 over '<timestamp>\\n<nonce>\\n' followed by the raw request body."""
+    message = f'{timestamp}\n{nonce}\n'.encode() + body
+    return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+class NonceWindow:
+    """
+    Remembers (reader, nonce) pairs until their signature timestamp falls out
+    of the allowed clock skew, which is all replay protection needs: anything
+    older is rejected on its timestamp alone. Capacity is bounded; past it the
+    oldest nonces are dropped early and counted.
+    """
+
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self._seen = {}
+        self._order = deque()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def check_and_add(self, key, expires_at, now):
+        """Return False if key was already seen inside the window."""
+        with self._lock:
+            while self._order and (self._order[0][0] < now or len(self._order) >= self.capacity):
+                expiry, old_key = self._order.popleft()
+                if self._seen.get(old_key) == expiry:
+                    del self._seen[old_key]
+                    if expiry >= now:
+                        self.dropped += 1
+            if key in self._seen:
+                return False
+            self._seen[key] = expires_at
+            self._order.append((expires_at, key))
+            return True
+
+    def __len__(self):
+        return len(self._seen)
+
+
+class ReaderAuth:
+    """
+    Stateless HMAC authentication for NFC readers.
+
+    Each reader signs its request with a key derived from NFC_API_KEY and its
+    reader id, sending X-NFC-Reader-Id, X-NFC-Timestamp (unix seconds),
+    X-NFC-Nonce and X-NFC-Signature headers. Verification is pure CPU: the key
+    is re-derived, the timestamp must be within NFC_SIGNATURE_MAX_SKEW seconds
+    and the nonce must not have been seen in that window. When NFC_API_KEY is
+    not configured the check is skipped so development setups keep working.
+    """
+
+    def __init__(self):
+        self.nonces = NonceWindow()
+        self._lock = threading.Lock()
+        self._counters = {'verified': 0, 'skipped': 0, 'rejected': {}}
+
+    def init_app(self, app):
+        self.nonces = NonceWindow(app.config.get('NFC_NONCE_CAPACITY', 100000))
+
+    def required(self, f):
+        """Decorate a reader-facing view; sets g.signed_reader_id on success."""
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            master_key = current_app.config.get('NFC_API_KEY')
+            if not master_key:
+                self._count('skipped')
+                g.signed_reader_id = None
+                return f(*args, **kwargs)
+
+            error = self.verify(master_key, current_app.config.get('NFC_SIGNATURE_MAX_SKEW', 30))
+            if error:
+                self._count_rejection(error)
+                return jsonify({'error': f'Reader authentication failed: {error}'}), 401
+
+            # A reader may only act for itself on endpoints that name it in the URL
+            if 'nfc_reader_id' in kwargs and kwargs['nfc_reader_id'] != g.signed_reader_id:
+                self._count_rejection('reader mismatch')
+                return jsonify({'error': 'Reader authentication failed: reader mismatch'}), 401
+
+            self._count('verified')
+            return f(*args, **kwargs)
+        return decorated_function
+
+    def verify(self, master_key, max_skew):
+        """Check the signature headers of the current request; returns an error string or None."""
+        reader_id = request.headers.get('X-NFC-Reader-Id')
+        timestamp = request.headers.get('X-NFC-Timestamp')
+        nonce = request.headers.get('X-NFC-Nonce')
+        signature = request.headers.get('X-NFC-Signature')
+
+        if not (reader_id and timestamp and nonce and signature):
+            return 'missing signature headers'
+        # compare_digest only accepts ASCII strings, so anything but 64 hex digits is rejected up front
+        if len(signature) != 64 or not all(c in string.hexdigits for c in signature):
+            return 'bad signature'
+        try:
+            signed_at = int(timestamp)
+        except ValueError:
+            return 'invalid timestamp'
+
+        now = time.time()
+        if abs(now - signed_at) > max_skew:
+            return 'stale timestamp'
+
+        expected = sign_request(derive_reader_key(master_key, reader_id), timestamp, nonce, request.get_data())
+        if not hmac.compare_digest(expected, signature.lower()):
+            return 'bad signature'
+
+        if not self.nonces.check_and_add((reader_id, nonce), signed_at + max_skew, now):
+            return 'replayed nonce'
+
+        g.signed_reader_id = reader_id
+        return None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['rejected'] = dict(self._counters['rejected'])
+        stats['nonces_tracked'] = len(self.nonces)
+        stats['nonces_dropped_early'] = self.nonces.dropped
+        return stats
+
+    def _count(self, key):
+        with self._lock:
+            self._counters[key] += 1
+
+    def _count_rejection(self, reason):
+        with self._lock:
+            rejected = self._counters['rejected']
+            rejected[reason] = rejected.get(reason, 0) + 1
+
+
+reader_auth = ReaderAuth()
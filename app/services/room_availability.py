@@ -0,0 +1,107 @@
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from app.models.database import db, run_after_commit
+from app.models.classroom import Classroom
+from app.models.schedule import Schedule
+from .session_index import RoomDay, SessionSlot
+
+
+class RoomAvailabilityIndex:
+    """
+    In-memory interval index of active schedules per (classroom, day_of_week),
+    for answering "which rooms are free at this time" in one pass.
+
+    Every committed write to a Schedule or Classroom bumps a version counter;
+    the index is rebuilt from two queries on the first lookup after that.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._built_version = None
+        self._classrooms = []
+        self._room_days = {}
+        self._counters = {
+            'lookups': 0,
+            'rebuilds': 0
+        }
+
+    def init_app(self, app):
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+
+    def available(self, day_of_week, start_time, end_time, min_capacity=None, exclude_id=None):
+        """
+        Active classrooms with no active schedule overlapping the slot, best fit
+        first: the smallest capacity that is large enough, rooms of unknown
+        capacity last. `exclude_id` ignores one schedule, e.g. the one being edited.
+        """
+        classrooms, room_days = self._snapshot()
+        free = []
+        for classroom in classrooms:
+            if min_capacity and (classroom.capacity or 0) < min_capacity:
+                continue
+            room = room_days.get((classroom.id, day_of_week))
+            if room is not None and room.overlaps(start_time, end_time, exclude_id):
+                continue
+            free.append(classroom)
+        free.sort(key=lambda classroom: (classroom.capacity is None, classroom.capacity or 0, classroom.room_number))
+        return free
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['version'] = self._version
+            stats['current'] = self._built_version == self._version
+            stats['classrooms'] = len(self._classrooms)
+            stats['schedules'] = sum(len(room.slots) for room in self._room_days.values())
+        return stats
+
+    def _snapshot(self):
+        with self._lock:
+            self._counters['lookups'] += 1
+            if self._built_version == self._version:
+                return self._classrooms, self._room_days
+            version = self._version
+
+        classrooms = db.session.query(
+            Classroom.id, Classroom.room_number, Classroom.building, Classroom.capacity
+        ).filter(Classroom.is_active == True).all()
+
+        slots = {}
+        for row in db.session.query(
+            Schedule.id, Schedule.classroom_id, Schedule.day_of_week, Schedule.start_time, Schedule.end_time
+        ).filter(Schedule.is_active == True):
+            slots.setdefault((row.classroom_id, row.day_of_week), []).append(
+                SessionSlot(row.id, None, None, row.start_time, row.end_time)
+            )
+        room_days = {key: RoomDay(room_slots) for key, room_slots in slots.items()}
+
+        with self._lock:
+            # A write committed while loading leaves the version ahead, so the
+            # next lookup rebuilds again rather than trusting this snapshot.
+            if self._version == version:
+                self._built_version = version
+            self._classrooms = classrooms
+            self._room_days = room_days
+            self._counters['rebuilds'] += 1
+        return classrooms, room_days
+
+
+room_availability = RoomAvailabilityIndex()
+
+
+@event.listens_for(Schedule, 'after_insert')
+@event.listens_for(Schedule, 'after_update')
+@event.listens_for(Schedule, 'after_delete')
+@event.listens_for(Classroom, 'after_insert')
+@event.listens_for(Classroom, 'after_update')
+@event.listens_for(Classroom, 'after_delete')
+def _timetable_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        run_after_commit(session, room_availability.invalidate)
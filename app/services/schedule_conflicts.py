@@ -0,0 +1,266 @@
+from datetime import datetime
+from heapq import heappush, heappop
+from app.models.database import db, chunked
+from app.models.course import Course, CourseEnrollment
+from app.models.classroom import Classroom
+from app.models.schedule import Schedule, ScheduleExclusion
+from .session_materializer import schedule_slot, sync_schedule_sessions
+from .schedule_index import schedule_index
+from .room_availability import room_availability
+from .timetable_cache import timetable_cache
+
+
+def sweep_overlaps(intervals):
+    """
+    Yield every pair of overlapping (start, end, item) intervals as (earlier, later).
+
+    Intervals are swept in start order while a heap holds the ones still open,
+    so the cost is O(n log n) plus the number of overlapping pairs. Intervals
+    that only touch (one ends as the next starts) do not overlap, matching
+    Schedule.find_conflicts.
+    """
+    active = []
+    for seq, (start, end, item) in enumerate(sorted(intervals, key=lambda interval: (interval[0], interval[1]))):
+        while active and active[0][0] <= start:
+            heappop(active)
+        for _, _, other in active:
+            yield other, item
+        heappush(active, (end, seq, item))
+
+
+def _parse_entry(entry):
+    """Validate one import entry the way create_schedule does; returns (values, error)."""
+    required_fields = ['course_id', 'classroom_id', 'day_of_week', 'start_time', 'end_time', 'semester']
+    if not isinstance(entry, dict) or not all(field in entry for field in required_fields):
+        return None, 'Missing required fields'
+    try:
+        values = {
+            'course_id': int(entry['course_id']),
+            'classroom_id': int(entry['classroom_id']),
+            'day_of_week': int(entry['day_of_week']),
+            'start_time': datetime.strptime(entry['start_time'], '%H:%M').time(),
+            'end_time': datetime.strptime(entry['end_time'], '%H:%M').time(),
+            'semester': int(entry['semester'])
+        }
+    except (TypeError, ValueError) as e:
+        return None, f'Invalid value: {str(e)}'
+
+    if values['start_time'] >= values['end_time']:
+        return None, 'Start time must be before end time'
+    if not (0 <= values['day_of_week'] <= 6):
+        return None, 'Day of week must be between 0 (Monday) and 6 (Sunday)'
+    if not (1 <= values['semester'] <= 8):
+        return None, 'Semester must be between 1 and 8'
+    values['exclusion_dates'] = entry.get('exclusion_dates')
+    return values, None
+
+
+def import_schedules(entries, dry_run=False):
+    """
+    Validate and insert a batch of schedules in one transaction.
+
+    Existing active schedules of the classrooms involved are loaded with one
+    query, then each (classroom, day) group of existing and new slots is swept
+    once for room conflicts. Nothing is inserted unless every entry is valid
+    and conflict-free, and then the rows go in as one executemany INSERT
+    that returns their ids.
+    Returns (schedule_ids, errors, conflicts); errors and conflicts refer to
+    entries by their index in `entries`.
+    """
+    errors = []
+    parsed = []
+    for index, entry in enumerate(entries):
+        values, error = _parse_entry(entry)
+        if error:
+            errors.append({'index': index, 'error': error})
+        else:
+            parsed.append((index, values))
+
+    course_ids = {values['course_id'] for _, values in parsed}
+    classroom_ids = {values['classroom_id'] for _, values in parsed}
+    course_codes = {}
+    for ids in chunked(course_ids):
+        course_codes.update(db.session.query(Course.id, Course.course_code).filter(Course.id.in_(ids)).all())
+    known_classrooms = set()
+    for ids in chunked(classroom_ids):
+        known_classrooms.update(row.id for row in db.session.query(Classroom.id).filter(Classroom.id.in_(ids)))
+
+    groups = {}
+    for index, values in parsed:
+        if values['course_id'] not in course_codes:
+            errors.append({'index': index, 'error': 'Course not found'})
+        elif values['classroom_id'] not in known_classrooms:
+            errors.append({'index': index, 'error': 'Classroom not found'})
+        else:
+            groups.setdefault((values['classroom_id'], values['day_of_week']), []).append(
+                (values['start_time'], values['end_time'], ('new', index))
+            )
+
+    # 1. One query for every active schedule that could collide with the import
+    existing = {}
+    for ids in chunked(known_classrooms):
+        for row in db.session.query(
+            Schedule.id, Schedule.classroom_id, Schedule.day_of_week,
+            Schedule.start_time, Schedule.end_time, Course.course_code
+        ).join(Course, Schedule.course_id == Course.id).filter(
+            Schedule.classroom_id.in_(ids),
+            Schedule.is_active == True
+        ):
+            key = (row.classroom_id, row.day_of_week)
+            if key in groups:
+                groups[key].append((row.start_time, row.end_time, ('existing', row.id)))
+                existing[row.id] = row
+
+    # 2. Sweep each (classroom, day) group; clashes between two existing rows are not ours to report
+    entries_by_index = dict(parsed)
+    conflicts = []
+    for (classroom_id, day_of_week), intervals in groups.items():
+        for first, second in sweep_overlaps(intervals):
+            if first[0] == 'existing' and second[0] == 'existing':
+                continue
+            if first[0] == 'existing':
+                first, second = second, first
+            conflicts.append({
+                'index': first[1],
+                'classroom_id': classroom_id,
+                'day_of_week': day_of_week,
+                'conflicts_with': _describe(second, entries_by_index, existing, course_codes)
+            })
+
+    if errors or conflicts or dry_run:
+        return [], errors, conflicts
+
+    # 3. Insert everything with one executemany, batched into multi-row
+    #    INSERT ... RETURNING statements; the unsaved Schedule objects only
+    #    format the rows and their slots
+    schedules = []
+    for index, values in parsed:
+        exclusion_dates = values.pop('exclusion_dates')
+        schedule = Schedule(**values)
+        if exclusion_dates:
+            schedule.exclusion_dates_list = exclusion_dates
+        schedules.append(schedule)
+    # SQLite has no sentinel for an ordered RETURNING and would insert row by
+    # row; its rowids follow the VALUES order, so sorted ids match the input
+    table = Schedule.__table__
+    in_order = db.session.get_bind().dialect.name != 'sqlite'
+    result = db.session.execute(table.insert().returning(table.c.id, sort_by_parameter_order=in_order), [
+        dict(values, exclusion_dates=schedule.exclusion_dates)
+        for (_, values), schedule in zip(parsed, schedules)
+    ])
+    schedule_ids = list(result.scalars()) if in_order else sorted(result.scalars())
+
+    # 4. Core inserts skip the mapper events that write exclusion rows and drop the indexes
+    exclusions = [
+        {'schedule_id': schedule_id, 'excluded_date': excluded_date}
+        for schedule_id, schedule in zip(schedule_ids, schedules)
+        for excluded_date in schedule.excluded_dates
+    ]
+    if exclusions:
+        db.session.execute(ScheduleExclusion.__table__.insert(), exclusions)
+    sync_schedule_sessions([(None, schedule_slot(schedule)) for schedule in schedules])
+    db.session.commit()
+    schedule_index.clear()
+    room_availability.invalidate()
+    timetable_cache.invalidate()
+    return schedule_ids, [], []
+
+
+def _describe(item, entries_by_index, existing, course_codes):
+    kind, key = item
+    if kind == 'existing':
+        row = existing[key]
+        return {
+            'schedule_id': row.id,
+            'course_code': row.course_code,
+            'time_range': f"{row.start_time.strftime('%H:%M')} - {row.end_time.strftime('%H:%M')}"
+        }
+    values = entries_by_index[key]
+    return {
+        'index': key,
+        'course_code': course_codes[values['course_id']],
+        'time_range': f"{values['start_time'].strftime('%H:%M')} - {values['end_time'].strftime('%H:%M')}"
+    }
+
+
+def audit_timetable():
+    """
+    Find every room, teacher and student clash in the active timetable.
+
+    All active schedules are loaded once and swept per day: overlapping pairs
+    in the same room are room conflicts, pairs whose courses share a teacher
+    are teacher conflicts, and for pairs of different courses the students
+    enrolled in both are found by intersecting the two courses' enrollment
+    sets. Returns a report dict.
+    """
+    schedules = {}
+    by_day = {}
+    for row in db.session.query(
+        Schedule.id, Schedule.course_id, Schedule.classroom_id, Schedule.day_of_week,
+        Schedule.start_time, Schedule.end_time, Course.course_code, Course.teacher_id
+    ).join(Course, Schedule.course_id == Course.id).filter(Schedule.is_active == True):
+        schedules[row.id] = row
+        by_day.setdefault(row.day_of_week, []).append((row.start_time, row.end_time, row.id))
+
+    room_conflicts = []
+    teacher_conflicts = []
+    course_pairs = {}
+    for day_of_week, intervals in by_day.items():
+        for first_id, second_id in sweep_overlaps(intervals):
+            first, second = schedules[first_id], schedules[second_id]
+            pair = [_schedule_summary(first), _schedule_summary(second)]
+            if first.classroom_id == second.classroom_id:
+                room_conflicts.append({'day_of_week': day_of_week, 'classroom_id': first.classroom_id, 'schedules': pair})
+            if first.teacher_id is not None and first.teacher_id == second.teacher_id:
+                teacher_conflicts.append({'day_of_week': day_of_week, 'teacher_id': first.teacher_id, 'schedules': pair})
+            if first.course_id != second.course_id:
+                course_pairs.setdefault(frozenset((first.course_id, second.course_id)), []).append(
+                    {'day_of_week': day_of_week, 'schedules': pair}
+                )
+
+    # Only enrollments in courses that clash with another course matter
+    students_by_course = {}
+    for course_ids in chunked({course_id for pair in course_pairs for course_id in pair}):
+        for row in db.session.query(CourseEnrollment.course_id, CourseEnrollment.student_id).filter(
+            CourseEnrollment.course_id.in_(course_ids),
+            CourseEnrollment.is_active == True
+        ):
+            students_by_course.setdefault(row.course_id, set()).add(row.student_id)
+
+    student_conflicts = []
+    for pair, clashes in course_pairs.items():
+        first_course, second_course = sorted(pair)
+        shared = students_by_course.get(first_course, set()) & students_by_course.get(second_course, set())
+        if not shared:
+            continue
+        for clash in clashes:
+            clash['student_count'] = len(shared)
+            clash['student_ids'] = sorted(shared)
+            student_conflicts.append(clash)
+
+    for conflicts in (room_conflicts, teacher_conflicts, student_conflicts):
+        conflicts.sort(key=lambda conflict: (conflict['day_of_week'], conflict['schedules'][0]['start_time']))
+
+    return {
+        'summary': {
+            'schedules': len(schedules),
+            'room_conflicts': len(room_conflicts),
+            'teacher_conflicts': len(teacher_conflicts),
+            'student_conflicts': len(student_conflicts),
+            'students_affected': len({student_id for clash in student_conflicts for student_id in clash['student_ids']})
+        },
+        'room_conflicts': room_conflicts,
+        'teacher_conflicts': teacher_conflicts,
+        'student_conflicts': student_conflicts
+    }
+
+
+def _schedule_summary(row):
+    return {
+        'schedule_id': row.id,
+        'course_id': row.course_id,
+        'course_code': row.course_code,
+        'classroom_id': row.classroom_id,
+        'start_time': row.start_time.strftime('%H:%M'),
+        'end_time': row.end_time.strftime('%H:%M')
+    }
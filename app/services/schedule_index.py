@@ -0,0 +1,101 @@
+import threading
+from datetime import timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from app.models.database import db, run_after_commit
+from app.models.course import Course
+from app.models.schedule import Schedule
+from .session_index import RoomDay, SessionSlot
+
+
+class ScheduleIndex:
+    """
+    In-memory index of the active schedules that fall on one day, per
+    classroom, used when a tap finds no materialized ClassSession.
+
+    Entries are SessionSlot tuples with id=None. The index covers the schedules
+    for a single (date, day_of_week), leaving out those with a
+    schedule_exclusions row for that date. It is rebuilt lazily when the date
+    changes and dropped whenever a schedule or course changes.
+    """
+
+    def __init__(self):
+        self._date = None
+        self._rooms = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._counters = {
+            'lookups': 0,
+            'rebuilds': 0
+        }
+
+    def init_app(self, app):
+        self.clear()
+
+    def find_for_tap(self, classroom_id, at, after_end=timedelta(0)):
+        """Scheduled slots a tap at `at` may belong to, like SessionIndex.find_for_tap()."""
+        room = self._room_day(classroom_id, at.date())
+        return room.find_for_tap(at, after_end) if room is not None else []
+
+    def clear(self):
+        with self._lock:
+            self._date = None
+            self._rooms = {}
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['date'] = self._date.isoformat() if self._date else None
+            stats['classrooms'] = len(self._rooms)
+            stats['schedules'] = sum(len(room.slots) for room in self._rooms.values())
+        return stats
+
+    def _room_day(self, classroom_id, on_date):
+        with self._lock:
+            self._counters['lookups'] += 1
+            if self._date == on_date:
+                return self._rooms.get(classroom_id)
+            generation = self._generation
+
+        rooms = self._load(on_date)
+        with self._lock:
+            if generation == self._generation:
+                self._date = on_date
+                self._rooms = rooms
+                self._generation += 1
+                self._counters['rebuilds'] += 1
+        return rooms.get(classroom_id)
+
+    @staticmethod
+    def _load(on_date):
+        excluded = Schedule.excluded_on(on_date).with_entities(Schedule.id)
+        slots_by_room = {}
+        for row in db.session.query(
+            Schedule.classroom_id,
+            Schedule.course_id,
+            Course.course_name,
+            Schedule.start_time,
+            Schedule.end_time
+        ).join(Course, Schedule.course_id == Course.id).filter(
+            Schedule.day_of_week == on_date.weekday(),
+            Schedule.is_active == True,
+            Schedule.id.not_in(excluded)
+        ):
+            slots_by_room.setdefault(row.classroom_id, []).append(
+                SessionSlot(None, row.course_id, row.course_name, row.start_time, row.end_time)
+            )
+        return {classroom_id: RoomDay(slots) for classroom_id, slots in slots_by_room.items()}
+
+
+schedule_index = ScheduleIndex()
+
+
+@event.listens_for(Schedule, 'after_insert')
+@event.listens_for(Schedule, 'after_update')
+@event.listens_for(Schedule, 'after_delete')
+@event.listens_for(Course, 'after_update')
+def _schedule_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        run_after_commit(session, schedule_index.clear)
@@ -0,0 +1,232 @@
+import threading
+from time import monotonic
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+from app.models.database import db, run_after_commit
+from app.models.course import Course
+from app.models.classroom import ClassSession
+
+
+SessionSlot = namedtuple('SessionSlot', ['id', 'course_id', 'course_name', 'start_time', 'end_time'])
+
+
+class RoomDay:
+    """One classroom's sessions for a day, sorted by start time."""
+
+    __slots__ = ('starts', 'max_ends', 'slots')
+
+    def __init__(self, slots):
+        self.slots = sorted(slots, key=lambda slot: (slot.start_time, slot.end_time))
+        self.starts = [slot.start_time for slot in self.slots]
+        # Running maximum of end times lets the backwards scan in find() stop
+        # as soon as no earlier session can still be in progress.
+        self.max_ends = []
+        for slot in self.slots:
+            latest = slot.end_time if not self.max_ends else max(self.max_ends[-1], slot.end_time)
+            self.max_ends.append(latest)
+
+    def find(self, at_time):
+        i = bisect_right(self.starts, at_time) - 1
+        while i >= 0 and self.max_ends[i] >= at_time:
+            if self.slots[i].end_time >= at_time:
+                return self.slots[i]
+            i -= 1
+        return None
+
+    def overlaps(self, start_time, end_time, ignore_id=None):
+        """True if any slot other than `ignore_id` overlaps [start_time, end_time)."""
+        i = bisect_left(self.starts, end_time) - 1
+        while i >= 0 and self.max_ends[i] > start_time:
+            slot = self.slots[i]
+            if slot.end_time > start_time and slot.id != ignore_id:
+                return True
+            i -= 1
+        return False
+
+    def find_ended(self, at_time, since_time):
+        """Return the session whose end falls latest in [since_time, at_time), or None."""
+        ended = None
+        i = bisect_right(self.starts, at_time) - 1
+        while i >= 0 and self.max_ends[i] >= since_time:
+            end_time = self.slots[i].end_time
+            if since_time <= end_time < at_time and (ended is None or end_time > ended.end_time):
+                ended = self.slots[i]
+            i -= 1
+        return ended
+
+    def find_for_tap(self, at, after_end=timedelta(0)):
+        """The slot running at datetime `at`, then one that ended within `after_end`."""
+        found = []
+        running = self.find(at.time())
+        if running is not None:
+            found.append(running)
+        if after_end:
+            since = max(at - after_end, datetime.combine(at.date(), time.min))
+            ended = self.find_ended(at.time(), since.time())
+            if ended is not None:
+                found.append(ended)
+        return found
+
+
+class SessionIndex:
+    """
+    In-memory index of one day's active ClassSession rows, per classroom, so the
+    tap path can find the running session with a binary search instead of a
+    range query.
+
+    The index is rebuilt lazily on the first lookup after midnight. Commits that
+    insert, update or delete a session on the indexed date mark its classroom
+    stale, and that classroom alone is reloaded on its next lookup. Commits in
+    other processes are not seen, so the whole day is also reloaded
+    SESSION_INDEX_TTL_SECONDS after it was built.
+    """
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._date = None
+        self._expires_at = None
+        self._rooms = {}
+        self._stale = set()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._counters = {
+            'lookups': 0,
+            'rebuilds': 0,
+            'room_reloads': 0
+        }
+
+    def init_app(self, app):
+        self.ttl = app.config.get('SESSION_INDEX_TTL_SECONDS', self.ttl)
+        self.clear()
+
+    def find(self, classroom_id, at):
+        """Return the SessionSlot running in a classroom at a datetime, or None."""
+        room = self._room(classroom_id, at.date())
+        return room.find(at.time()) if room is not None else None
+
+    def find_for_tap(self, classroom_id, at, after_end=timedelta(0)):
+        """
+        Return the sessions a tap at `at` may belong to: the one running, then
+        one that ended within `after_end` (a late check-out). Either may be missing.
+        """
+        room = self._room(classroom_id, at.date())
+        return room.find_for_tap(at, after_end) if room is not None else []
+
+    def mark_stale(self, on_date, classroom_ids):
+        with self._lock:
+            if self._date == on_date:
+                self._stale.update(classroom_ids)
+                self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._date = None
+            self._expires_at = None
+            self._rooms = {}
+            self._stale.clear()
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['date'] = self._date.isoformat() if self._date else None
+            stats['classrooms'] = len(self._rooms)
+            stats['sessions'] = sum(len(room.slots) for room in self._rooms.values())
+            stats['stale_classrooms'] = len(self._stale)
+        return stats
+
+    def _room(self, classroom_id, on_date):
+        now = monotonic()
+        with self._lock:
+            self._counters['lookups'] += 1
+            expired = self._expires_at is not None and now >= self._expires_at
+            if self._date == on_date and not expired and classroom_id not in self._stale:
+                return self._rooms.get(classroom_id)
+            full_rebuild = self._date != on_date or expired
+            generation = self._generation
+
+        if full_rebuild:
+            rooms = self._load(on_date)
+            with self._lock:
+                if generation == self._generation:
+                    self._date = on_date
+                    self._rooms = rooms
+                    self._expires_at = now + self.ttl if self.ttl else None
+                    self._stale.clear()
+                    self._generation += 1
+                    self._counters['rebuilds'] += 1
+            return rooms.get(classroom_id)
+
+        room = self._load(on_date, classroom_id).get(classroom_id)
+        with self._lock:
+            if generation == self._generation:
+                if room is None:
+                    self._rooms.pop(classroom_id, None)
+                else:
+                    self._rooms[classroom_id] = room
+                self._stale.discard(classroom_id)
+                self._counters['room_reloads'] += 1
+        return room
+
+    @staticmethod
+    def _load(on_date, classroom_id=None):
+        classroom_ids = [classroom_id] if classroom_id is not None else None
+        room_days = load_room_days([on_date], classroom_ids)
+        return {room_id: room for (room_id, _), room in room_days.items()}
+
+
+def load_room_days(dates, classroom_ids=None):
+    """Load active sessions for the given dates as {(classroom_id, date): RoomDay}."""
+    query = db.session.query(
+        ClassSession.id,
+        ClassSession.classroom_id,
+        ClassSession.session_date,
+        ClassSession.course_id,
+        Course.course_name,
+        ClassSession.start_time,
+        ClassSession.end_time
+    ).join(Course, ClassSession.course_id == Course.id).filter(
+        ClassSession.session_date.in_(list(dates)),
+        ClassSession.is_active == True
+    )
+    if classroom_ids is not None:
+        query = query.filter(ClassSession.classroom_id.in_(list(classroom_ids)))
+
+    slots_by_room_day = {}
+    for row in query.all():
+        slots_by_room_day.setdefault((row.classroom_id, row.session_date), []).append(
+            SessionSlot(row.id, row.course_id, row.course_name, row.start_time, row.end_time)
+        )
+    return {key: RoomDay(slots) for key, slots in slots_by_room_day.items()}
+
+
+session_index = SessionIndex()
+
+
+@event.listens_for(ClassSession, 'after_insert')
+@event.listens_for(ClassSession, 'after_update')
+@event.listens_for(ClassSession, 'after_delete')
+def _class_session_changed(mapper, connection, target):
+    state = inspect(target)
+    dates = {target.session_date, *state.attrs.session_date.history.deleted}
+    classroom_ids = {target.classroom_id, *state.attrs.classroom_id.history.deleted}
+
+    def mark_stale():
+        for on_date in dates:
+            session_index.mark_stale(on_date, classroom_ids)
+
+    session = object_session(target)
+    if session is not None:
+        run_after_commit(session, mark_stale)
+
+
+@event.listens_for(Course, 'after_update')
+def _course_changed(mapper, connection, target):
+    # Slots carry the course name for the tap response; renames are rare
+    # enough that dropping the whole index is the simplest correct answer.
+    session = object_session(target)
+    if session is not None:
+        run_after_commit(session, session_index.clear)
@@ -0,0 +1,268 @@
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app.models.database import db, chunked, insert_ignoring_conflicts, run_after_commit
+from app.models.attendance import Attendance
+from app.models.classroom import ClassSession
+from app.models.schedule import Schedule
+from .session_index import session_index
+
+
+INSERT_CHUNK_SIZE = 1000
+SLOT_INDEX = 'ux_class_sessions_slot'
+
+ScheduleSlot = namedtuple('ScheduleSlot', ['course_id', 'classroom_id', 'day_of_week', 'start_time', 'end_time', 'excluded'])
+
+
+def schedule_slot(schedule):
+    """The recurring slot an active schedule occupies, or None if it is inactive."""
+    # is_active is still None on a schedule that has not been flushed yet
+    if schedule.is_active is False:
+        return None
+    return ScheduleSlot(
+        schedule.course_id,
+        schedule.classroom_id,
+        schedule.day_of_week,
+        schedule.start_time,
+        schedule.end_time,
+        schedule.excluded_dates
+    )
+
+
+def occurrence_dates(day_of_week, date_from, date_to, excluded=frozenset()):
+    """Dates in [date_from, date_to] falling on day_of_week, minus excluded dates."""
+    current = date_from + timedelta(days=(day_of_week - date_from.weekday()) % 7)
+    step = timedelta(days=7)
+    while current <= date_to:
+        if current not in excluded:
+            yield current
+        current += step
+
+
+def materialize_sessions(date_from, date_to, schedule_ids=None):
+    """
+    Expand active schedules into ClassSession rows for [date_from, date_to].
+
+    Keys of the sessions already in the range are loaded once and skipped; the
+    rest are inserted with executemany in chunks. The caller commits. Returns
+    the number of sessions created.
+    """
+    query = Schedule.query.filter(Schedule.is_active == True)
+    if schedule_ids is not None:
+        query = query.filter(Schedule.id.in_(list(schedule_ids)))
+    slots = [schedule_slot(schedule) for schedule in query]
+    if not slots:
+        return 0
+
+    existing = set(db.session.query(
+        ClassSession.course_id,
+        ClassSession.classroom_id,
+        ClassSession.session_date,
+        ClassSession.start_time
+    ).filter(ClassSession.session_date.between(date_from, date_to)).all())
+
+    rows = []
+    for slot in slots:
+        for session_date in occurrence_dates(slot.day_of_week, date_from, date_to, slot.excluded):
+            key = (slot.course_id, slot.classroom_id, session_date, slot.start_time)
+            if key in existing:
+                continue
+            existing.add(key)
+            rows.append(_session_row(key, slot.end_time))
+
+    _insert_sessions(rows)
+    return len(rows)
+
+
+def materialize_session(classroom_id, session_date, slot):
+    """
+    Create the ClassSession for a scheduled slot on a date, exactly once even
+    under concurrent taps: an INSERT ... ON CONFLICT DO NOTHING on the unique
+    slot index, then a lookup of the winning row if ours lost. Returns the slot
+    with its session id, or None if the session exists but was deactivated.
+    The caller commits.
+    """
+    key = (slot.course_id, classroom_id, session_date, slot.start_time)
+    values = _session_row(key, slot.end_time)
+    table = ClassSession.__table__
+
+    stmt = None
+    if _has_slot_index():
+        stmt = insert_ignoring_conflicts(table, ['course_id', 'classroom_id', 'session_date', 'start_time'])
+    if stmt is not None:
+        row = db.session.execute(stmt.values(**values).returning(table.c.id)).first()
+        if row is not None:
+            _mark_index_stale([(session_date, classroom_id)])
+            return slot._replace(id=row.id)
+    else:
+        try:
+            with db.session.begin_nested():
+                result = db.session.execute(table.insert().values(**values))
+            _mark_index_stale([(session_date, classroom_id)])
+            return slot._replace(id=result.inserted_primary_key[0])
+        except IntegrityError:
+            pass
+
+    existing = db.session.query(ClassSession.id, ClassSession.end_time, ClassSession.is_active).filter_by(
+        course_id=slot.course_id,
+        classroom_id=classroom_id,
+        session_date=session_date,
+        start_time=slot.start_time
+    ).first()
+    if existing is None or not existing.is_active:
+        return None
+    return slot._replace(id=existing.id, end_time=existing.end_time)
+
+
+_slot_index_present = {}
+
+
+def _has_slot_index():
+    # Databases created before the slot index was declared lack it until
+    # init-db or db-optimize runs, and ON CONFLICT needs it to exist
+    connection = db.session.connection()
+    url = str(connection.engine.url)
+    if url not in _slot_index_present:
+        _slot_index_present[url] = any(
+            index['name'] == SLOT_INDEX for index in db.inspect(connection).get_indexes(ClassSession.__tablename__)
+        )
+    return _slot_index_present[url]
+
+
+def sync_schedule_sessions(changes, now=None):
+    """
+    Bring already-materialized future sessions in line with edited schedules.
+
+    `changes` is a list of (previous, current) ScheduleSlot pairs, either of
+    which may be None for a created or deactivated schedule. Only sessions that
+    have not started yet and fall on or before the last materialized date are
+    touched: sessions the new slots no longer produce are deleted (or
+    deactivated if attendance was already recorded against them), sessions
+    they still produce are updated in place, and missing ones are inserted.
+    The caller commits. Returns (created, removed).
+    """
+    changes = [(previous, current) for previous, current in changes if previous != current]
+    if not changes:
+        return 0, 0
+
+    now = now or datetime.now()
+    horizon = db.session.query(func.max(ClassSession.session_date)).scalar()
+    if horizon is None or horizon < now.date():
+        return 0, 0
+
+    def is_future(session_date, start_time):
+        return datetime.combine(session_date, start_time) > now
+
+    # (course_id, classroom_id, session_date, start_time) -> end_time
+    wanted = {}
+    for _, current in changes:
+        if current is None:
+            continue
+        for session_date in occurrence_dates(current.day_of_week, now.date(), horizon, current.excluded):
+            if is_future(session_date, current.start_time):
+                wanted[(current.course_id, current.classroom_id, session_date, current.start_time)] = current.end_time
+
+    # Sessions carry no schedule id, so the ones a previous slot produced are
+    # recognised by course, room, weekday and times.
+    previous_slots = {
+        (previous.course_id, previous.classroom_id, previous.day_of_week, previous.start_time, previous.end_time)
+        for previous, _ in changes if previous is not None
+    }
+    course_ids = {course_id for course_id, _, _, _ in wanted}
+    course_ids.update(slot[0] for slot in previous_slots)
+
+    sessions = {}
+    stale = {}
+    for ids in chunked(course_ids):
+        for row in db.session.query(
+            ClassSession.id,
+            ClassSession.course_id,
+            ClassSession.classroom_id,
+            ClassSession.session_date,
+            ClassSession.start_time,
+            ClassSession.end_time,
+            ClassSession.is_active
+        ).filter(
+            ClassSession.course_id.in_(ids),
+            ClassSession.session_date.between(now.date(), horizon)
+        ):
+            if not is_future(row.session_date, row.start_time):
+                continue
+            key = (row.course_id, row.classroom_id, row.session_date, row.start_time)
+            sessions[key] = row
+            slot_key = (row.course_id, row.classroom_id, row.session_date.weekday(), row.start_time, row.end_time)
+            if row.is_active and key not in wanted and slot_key in previous_slots:
+                stale[key] = row.id
+    _remove_sessions(stale)
+
+    # Sessions already in place for a wanted slot are re-timed or reactivated
+    # rather than re-inserted, which the unique slot index would reject.
+    rows = []
+    updates = {}
+    for key, end_time in wanted.items():
+        row = sessions.get(key)
+        if row is None:
+            rows.append(_session_row(key, end_time))
+        elif row.end_time != end_time or not row.is_active:
+            updates.setdefault(end_time, []).append((row.id, key))
+    table = ClassSession.__table__
+    for end_time, targets in updates.items():
+        for chunk in chunked(targets):
+            db.session.execute(
+                table.update().where(table.c.id.in_([session_id for session_id, _ in chunk])).values(
+                    end_time=end_time, is_active=True
+                )
+            )
+    _mark_index_stale((key[2], key[1]) for targets in updates.values() for _, key in targets)
+
+    _insert_sessions(rows)
+    return len(rows), len(stale)
+
+
+def _session_row(key, end_time):
+    course_id, classroom_id, session_date, start_time = key
+    return {
+        'course_id': course_id,
+        'classroom_id': classroom_id,
+        'session_date': session_date,
+        'start_time': start_time,
+        'end_time': end_time,
+        'is_active': True,
+        'created_at': datetime.utcnow()
+    }
+
+
+def _insert_sessions(rows):
+    table = ClassSession.__table__
+    for chunk in chunked(rows, INSERT_CHUNK_SIZE):
+        db.session.execute(table.insert(), chunk)
+    _mark_index_stale((row['session_date'], row['classroom_id']) for row in rows)
+
+
+def _remove_sessions(sessions_by_key):
+    """Delete sessions by id, deactivating instead any that already have attendance."""
+    session_ids = list(sessions_by_key.values())
+    attended = set()
+    for ids in chunked(session_ids):
+        attended.update(
+            row[0] for row in db.session.query(Attendance.class_session_id).filter(
+                Attendance.class_session_id.in_(ids)
+            ).distinct()
+        )
+
+    table = ClassSession.__table__
+    for ids in chunked([session_id for session_id in session_ids if session_id not in attended]):
+        db.session.execute(table.delete().where(table.c.id.in_(ids)))
+    for ids in chunked(attended):
+        db.session.execute(table.update().where(table.c.id.in_(ids)).values(is_active=False))
+    _mark_index_stale((key[2], key[1]) for key in sessions_by_key)
+
+
+def _mark_index_stale(date_classrooms):
+    # Core statements bypass the ClassSession mapper events the session index
+    # listens to, so today's affected classrooms are marked stale here instead.
+    today = date.today()
+    classroom_ids = {classroom_id for session_date, classroom_id in date_classrooms if session_date == today}
+    if classroom_ids:
+        run_after_commit(db.session(), lambda: session_index.mark_stale(today, classroom_ids))
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import random
+import threading
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from flask import request, current_app, has_app_context, has_request_context
+from app.models.database import db, time_cursor_executes
+
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN '
+}
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+
+
+def redact_parameters(parameters):
+    """Replace every bound value but None with its type name, keeping the shape."""
+    if isinstance(parameters, dict):
+        return {key: redact_parameters(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact_parameters(value) for value in parameters]
+    if parameters is None:
+        return None
+    return f'<{type(parameters).__name__}>'
+
+
+class SlowQueryLog:
+    """
+    Opt-in recorder of statements slower than SLOW_QUERY_THRESHOLD_MS.
+
+    Each slow statement is appended to a size-rotated JSONL file with its SQL,
+    redacted parameters, duration and the endpoint that ran it. A
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE fraction of them also gets its plan from
+    EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (PostgreSQL), run on a separate
+    cursor of the same connection (inside a savepoint on PostgreSQL) with the
+    original parameters.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self._logger = None
+        self._lock = threading.Lock()
+        self._counters = {
+            'recorded': 0,
+            'explained': 0,
+            'explain_errors': 0
+        }
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SLOW_QUERY_LOG_ENABLED', False)
+        if not self.enabled:
+            return
+
+        self.path = app.config.get('SLOW_QUERY_LOG_PATH') or os.path.join(app.instance_path, 'slow_queries.jsonl')
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        handler = RotatingFileHandler(
+            self.path,
+            maxBytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024),
+            backupCount=app.config.get('SLOW_QUERY_LOG_BACKUPS', 3)
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self._logger = logging.getLogger(f'{__name__}.{id(app)}')
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.handlers = [handler]
+
+        with app.app_context():
+            time_cursor_executes(db.engine, self._statement_finished)
+
+    def recent(self, limit=100, endpoint=None):
+        """The newest entries in the current log file, newest first."""
+        if not self.path or not os.path.exists(self.path):
+            return []
+        entries = deque(maxlen=limit)
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if endpoint is None or entry.get('endpoint') == endpoint:
+                    entries.append(entry)
+        return list(reversed(entries))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['enabled'] = self.enabled
+        stats['path'] = self.path
+        return stats
+
+    def _statement_finished(self, conn, statement, parameters, executemany, seconds):
+        if not has_app_context():
+            return
+        config = current_app.config
+        duration_ms = seconds * 1000
+        if duration_ms < config.get('SLOW_QUERY_THRESHOLD_MS', 100):
+            return
+
+        entry = {
+            'at': datetime.utcnow().isoformat(),
+            'duration_ms': round(duration_ms, 3),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'method': request.method if has_request_context() else None,
+            'statement': statement,
+            'parameters': redact_parameters(parameters),
+            'executemany': executemany
+        }
+        if not executemany and random.random() < config.get('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1):
+            entry['plan'] = self._explain(conn, statement, parameters)
+
+        self._logger.info(json.dumps(entry, default=str))
+        with self._lock:
+            self._counters['recorded'] += 1
+
+    def _explain(self, conn, statement, parameters):
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        # A separate DBAPI cursor leaves the original result set untouched and
+        # bypasses the engine events, so the EXPLAIN is not itself recorded.
+        # PostgreSQL aborts the whole transaction when a statement fails, so
+        # there the EXPLAIN runs in a savepoint; SQLite needs none (and refuses
+        # one while a RETURNING statement is still being read).
+        savepoint = conn.dialect.name == 'postgresql'
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute('SAVEPOINT slow_query_explain')
+            try:
+                cursor.execute(prefix + statement, parameters or ())
+                plan = [' | '.join(str(column) for column in row) for row in cursor.fetchall()]
+            except Exception:
+                if savepoint:
+                    cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                raise
+            finally:
+                if savepoint:
+                    cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        except Exception as e:
+            with self._lock:
+                self._counters['explain_errors'] += 1
+            return [f'EXPLAIN failed: {e}']
+        finally:
+            cursor.close()
+        with self._lock:
+            self._counters['explained'] += 1
+        return plan
+
+
+slow_query_log = SlowQueryLog()
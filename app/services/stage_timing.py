@@ -0,0 +1,148 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from flask import g, current_app, make_response
+
+
+# Upper bounds in milliseconds; the last bucket catches everything slower.
+BUCKET_BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+
+class RollingHistogram:
+    """
+    Fixed-bucket latency histogram over a sliding window made of time slices.
+    Observations land in the current slice; slices older than the window are
+    reused, so memory stays constant no matter how long the process runs.
+    Percentiles are reported as the upper bound of the bucket they fall in.
+    """
+
+    def __init__(self, slices=6, slice_seconds=10):
+        self.slice_seconds = slice_seconds
+        self._epochs = [None] * slices
+        self._counts = [[0] * len(BUCKET_BOUNDS_MS) for _ in range(slices)]
+        self._sums = [0.0] * slices
+        self._maxes = [0.0] * slices
+
+    def observe(self, value_ms, now):
+        epoch = int(now // self.slice_seconds)
+        slot = epoch % len(self._epochs)
+        if self._epochs[slot] != epoch:
+            self._epochs[slot] = epoch
+            self._counts[slot] = [0] * len(BUCKET_BOUNDS_MS)
+            self._sums[slot] = 0.0
+            self._maxes[slot] = 0.0
+        self._counts[slot][bisect_left(BUCKET_BOUNDS_MS, value_ms)] += 1
+        self._sums[slot] += value_ms
+        self._maxes[slot] = max(self._maxes[slot], value_ms)
+
+    def snapshot(self, now):
+        oldest = int(now // self.slice_seconds) - len(self._epochs) + 1
+        counts = [0] * len(BUCKET_BOUNDS_MS)
+        total = 0.0
+        maximum = 0.0
+        for slot, epoch in enumerate(self._epochs):
+            if epoch is None or epoch < oldest:
+                continue
+            for i, count in enumerate(self._counts[slot]):
+                counts[i] += count
+            total += self._sums[slot]
+            maximum = max(maximum, self._maxes[slot])
+
+        n = sum(counts)
+        snapshot = {
+            'count': n,
+            'mean_ms': round(total / n, 3) if n else 0.0,
+            'max_ms': round(maximum, 3)
+        }
+        for pct in (50, 95, 99):
+            snapshot[f'p{pct}_ms'] = self._percentile(counts, n, pct)
+        snapshot['buckets'] = {
+            ('+Inf' if bound == float('inf') else str(bound)): count
+            for bound, count in zip(BUCKET_BOUNDS_MS, counts) if count
+        }
+        return snapshot
+
+    @staticmethod
+    def _percentile(counts, n, pct):
+        if not n:
+            return 0.0
+        rank = pct / 100 * n
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS, counts):
+            seen += count
+            if seen >= rank:
+                return bound if bound != float('inf') else BUCKET_BOUNDS_MS[-2]
+        return BUCKET_BOUNDS_MS[-2]
+
+
+class StageTimings:
+    """Rolling per-stage latency histograms for instrumented endpoints."""
+
+    def __init__(self, slices=6, slice_seconds=10):
+        self.slices = slices
+        self.slice_seconds = slice_seconds
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.slices = app.config.get('STAGE_TIMING_SLICES', self.slices)
+        self.slice_seconds = app.config.get('STAGE_TIMING_SLICE_SECONDS', self.slice_seconds)
+        with self._lock:
+            self._histograms = {}
+
+    def timed(self, name):
+        """
+        Decorate a view so the stages it marks with mark_stage() are recorded
+        under `name`, along with the total, and optionally reported to the
+        client in a Server-Timing header.
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                started = time.perf_counter()
+                g.stage_marks = [('start', started)]
+                response = make_response(f(*args, **kwargs))
+                finished = time.perf_counter()
+
+                durations = []
+                marks = g.stage_marks
+                for (_, previous), (stage, at) in zip(marks, marks[1:]):
+                    durations.append((stage, (at - previous) * 1000))
+                durations.append(('total', (finished - started) * 1000))
+                self.record(name, durations)
+
+                if current_app.config.get('SERVER_TIMING_ENABLED'):
+                    response.headers['Server-Timing'] = ', '.join(
+                        f'{stage};dur={duration:.3f}' for stage, duration in durations
+                    )
+                return response
+            return decorated_function
+        return decorator
+
+    def record(self, name, durations):
+        now = time.monotonic()
+        with self._lock:
+            for stage, duration in durations:
+                histogram = self._histograms.get((name, stage))
+                if histogram is None:
+                    histogram = self._histograms[(name, stage)] = RollingHistogram(self.slices, self.slice_seconds)
+                histogram.observe(duration, now)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = {'window_seconds': self.slices * self.slice_seconds}
+            for (name, stage), histogram in sorted(self._histograms.items()):
+                stats.setdefault(name, {})[stage] = histogram.snapshot(now)
+        return stats
+
+
+def mark_stage(stage):
+    """Close the current stage of a view decorated with StageTimings.timed()."""
+    marks = g.get('stage_marks')
+    if marks is not None:
+        marks.append((stage, time.perf_counter()))
+
+
+stage_timings = StageTimings()
@@ -0,0 +1,237 @@
+from datetime import datetime
+from flask import current_app
+from app.models.database import db, chunked
+from app.models.student import Student
+from app.models.classroom import Classroom
+from app.models.attendance import Attendance
+from .session_index import load_room_days
+from .enrollment_index import enrollment_index
+from .check_out import CHECK_IN, CHECK_OUT, check_out_window, tap_action
+
+
+def parse_tap_time(value):
+    """Parse an ISO 8601 tap timestamp into a naive local datetime."""
+    tapped_at = datetime.fromisoformat(value)
+    if tapped_at.tzinfo is not None:
+        tapped_at = tapped_at.astimezone().replace(tzinfo=None)
+    return tapped_at
+
+
+def mark_taps(events, method='nfc_card', reader_id=None):
+    """
+    Resolve and record a list of buffered taps with set-based queries.
+
+    Each event is a dict with 'nfc_tag_id', 'nfc_reader_id' and 'tapped_at'.
+    Students, classrooms, sessions and existing attendance are each loaded with
+    one IN query per chunk of keys, enrollment is checked against the in-memory
+    enrollment index, and all new Attendance rows are inserted in one
+    transaction. Taps in a session's check-out window close the student's
+    check-in the same way mark_attendance does. With `reader_id` (the signed
+    reader) set, events from any other reader are rejected. Returns one result
+    dict per event, in input order.
+    """
+    results = [None] * len(events)
+    parsed = []
+
+    for i, event in enumerate(events):
+        if not isinstance(event, dict) or not event.get('nfc_tag_id') or not event.get('nfc_reader_id'):
+            results[i] = {'status': 'rejected', 'code': 400, 'error': 'Missing nfc_tag_id or nfc_reader_id'}
+            continue
+        if not isinstance(event['nfc_tag_id'], str) or not isinstance(event['nfc_reader_id'], str):
+            results[i] = {'status': 'rejected', 'code': 400, 'error': 'nfc_tag_id and nfc_reader_id must be strings'}
+            continue
+        if reader_id and event['nfc_reader_id'] != reader_id:
+            results[i] = {'status': 'rejected', 'code': 401, 'error': 'Reader authentication failed: reader mismatch'}
+            continue
+        try:
+            tapped_at = parse_tap_time(event['tapped_at']) if event.get('tapped_at') else datetime.now()
+        except (TypeError, ValueError):
+            results[i] = {'status': 'rejected', 'code': 400, 'error': 'Invalid tapped_at timestamp'}
+            continue
+        parsed.append((i, event['nfc_tag_id'], event['nfc_reader_id'], tapped_at))
+
+    # 1. Resolve every distinct tag and reader in bulk
+    students = {}
+    for tags in chunked({tag for _, tag, _, _ in parsed}):
+        for row in db.session.query(
+            Student.nfc_tag_id, Student.id, Student.first_name, Student.last_name
+        ).filter(Student.nfc_tag_id.in_(tags)):
+            students[row.nfc_tag_id] = (row.id, f"{row.first_name} {row.last_name}")
+
+    classrooms = {}
+    for readers in chunked({reader for _, _, reader, _ in parsed}):
+        for row in db.session.query(
+            Classroom.nfc_reader_id, Classroom.id, Classroom.room_number
+        ).filter(Classroom.nfc_reader_id.in_(readers)):
+            classrooms[row.nfc_reader_id] = (row.id, row.room_number)
+
+    # 2. Load the sessions of every (classroom, date) the batch touches
+    dates = {tapped_at.date() for _, _, _, tapped_at in parsed}
+    room_days = {}
+    if dates:
+        for classroom_ids in chunked({classroom_id for classroom_id, _ in classrooms.values()}):
+            room_days.update(load_room_days(dates, classroom_ids))
+
+    # 3. Resolve each tap to a (student, session) pair
+    before_end, after_end = check_out_window(current_app.config)
+    matched = []
+    for i, tag, reader, tapped_at in parsed:
+        student = students.get(tag)
+        if not student:
+            results[i] = {'status': 'rejected', 'code': 404, 'error': 'Invalid student NFC tag'}
+            continue
+        classroom = classrooms.get(reader)
+        if not classroom:
+            results[i] = {'status': 'rejected', 'code': 404, 'error': 'Invalid classroom NFC reader ID'}
+            continue
+
+        room = room_days.get((classroom[0], tapped_at.date()))
+        candidates = room.find_for_tap(tapped_at, after_end) if room is not None else []
+        if not candidates:
+            results[i] = {
+                'status': 'rejected',
+                'code': 404,
+                'error': f'No active class session found in classroom {classroom[1]} at this time'
+            }
+            continue
+
+        class_session = next(
+            (slot for slot in candidates if enrollment_index.is_enrolled(student[0], slot.course_id)), None
+        )
+        if not class_session:
+            results[i] = {
+                'status': 'rejected',
+                'code': 403,
+                'error': f'Access denied: Student {student[1]} is not enrolled in {candidates[0].course_name}.'
+            }
+            continue
+
+        matched.append((i, student, classroom, class_session, tapped_at))
+
+    # 4. Find attendance already recorded for the matched pairs, as
+    #    (student_id, session_id) -> [check_in_time, check_out_time, attendance_id]
+    existing = {}
+    student_ids = {student[0] for _, student, _, _, _ in matched}
+    for session_ids in chunked({class_session.id for _, _, _, class_session, _ in matched}):
+        for row in db.session.query(
+            Attendance.id, Attendance.student_id, Attendance.class_session_id,
+            Attendance.check_in_time, Attendance.check_out_time
+        ).filter(Attendance.class_session_id.in_(session_ids)):
+            if row.student_id in student_ids:
+                existing[(row.student_id, row.class_session_id)] = [row.check_in_time, row.check_out_time, row.id]
+
+    # 5. Insert the first check-in of each new pair and close open check-ins;
+    #    later taps in the batch are repeats
+    new_rows = {}
+    check_outs = []
+    for i, student, classroom, class_session, tapped_at in matched:
+        key = (student[0], class_session.id)
+        action = tap_action(tapped_at, class_session.end_time, before_end, after_end)
+        times = existing.get(key)
+
+        if action != CHECK_IN and times is not None:
+            if times[1] is not None:
+                results[i] = {
+                    'status': 'already_marked',
+                    'code': 200,
+                    'message': 'Check-out already recorded for this session',
+                    'student_name': student[1],
+                    'check_out_time': times[1].isoformat()
+                }
+                continue
+            times[1] = tapped_at
+            if key in new_rows:
+                new_rows[key]['check_out_time'] = tapped_at
+            else:
+                check_outs.append((i, times[2], tapped_at))
+            results[i] = {
+                'status': 'checked_out',
+                'code': 200,
+                'message': 'Check-out recorded successfully',
+                'student_name': student[1],
+                'course': class_session.course_name,
+                'classroom': classroom[1],
+                'check_out_time': tapped_at.isoformat()
+            }
+            continue
+
+        if action == CHECK_OUT:
+            results[i] = {
+                'status': 'rejected',
+                'code': 404,
+                'error': f'No open check-in to close for {student[1]} in {class_session.course_name}'
+            }
+            continue
+
+        if times is not None:
+            results[i] = {
+                'status': 'already_marked',
+                'code': 200,
+                'message': 'Attendance already marked for this session',
+                'student_name': student[1],
+                'check_in_time': times[0].isoformat()
+            }
+            continue
+
+        existing[key] = [tapped_at, None, None]
+        new_rows[key] = {
+            'student_id': student[0],
+            'class_session_id': class_session.id,
+            'check_in_time': tapped_at,
+            'check_out_time': None,
+            'status': 'present',
+            'method': method
+        }
+        results[i] = {
+            'status': 'marked',
+            'code': 201,
+            'message': 'Attendance marked successfully',
+            'student_name': student[1],
+            'course': class_session.course_name,
+            'classroom': classroom[1],
+            'check_in_time': tapped_at.isoformat()
+        }
+
+    # Close the open check-ins together; one another request closed since
+    # step 4 is reported as already checked out
+    closed = Attendance.record_check_outs({
+        attendance_id: tapped_at for _, attendance_id, tapped_at in check_outs
+    })
+    for i, attendance_id, _ in check_outs:
+        if attendance_id not in closed:
+            results[i] = {
+                'status': 'already_marked',
+                'code': 200,
+                'message': 'Check-out already recorded for this session',
+                'student_name': results[i]['student_name']
+            }
+
+    # Rows another request inserted since step 4 are skipped by the upsert and
+    # reported with the check-in time that won the race.
+    new_rows = list(new_rows.values())
+    inserted = Attendance.insert_ignoring_duplicates(new_rows)
+    lost_races = {}
+    for row in new_rows:
+        key = (row['student_id'], row['class_session_id'])
+        if key not in inserted:
+            lost_races[key] = row
+    if lost_races:
+        for row in db.session.query(
+            Attendance.student_id, Attendance.class_session_id, Attendance.check_in_time, Attendance.check_out_time
+        ).filter(Attendance.class_session_id.in_({key[1] for key in lost_races})):
+            key = (row.student_id, row.class_session_id)
+            if key in lost_races:
+                existing[key] = [row.check_in_time, row.check_out_time, None]
+        for i, student, _, class_session, _ in matched:
+            key = (student[0], class_session.id)
+            if key in lost_races and results[i]['status'] == 'marked':
+                results[i] = {
+                    'status': 'already_marked',
+                    'code': 200,
+                    'message': 'Attendance already marked for this session',
+                    'student_name': student[1],
+                    'check_in_time': existing[key][0].isoformat()
+                }
+    db.session.commit()
+
+    return results
@@ -0,0 +1,93 @@
+import threading
+import time
+
+
+class TapDedupWindow:
+    """
+    Time-bounded de-duplication of repeat taps, keyed by (nfc_tag_id, nfc_reader_id).
+
+    After a tap has been recorded its response is remembered for
+    TAP_DEDUP_WINDOW_SECONDS, and repeats inside that window are answered from
+    memory without touching the database. Memory is fixed: keys live in a ring
+    buffer of TAP_DEDUP_CAPACITY slots, and writing a slot drops whatever key
+    occupied it before, even if that key had not yet expired.
+    """
+
+    def __init__(self, capacity=8192, window_seconds=30):
+        self._lock = threading.Lock()
+        self._configure(capacity, window_seconds)
+
+    def init_app(self, app):
+        self._configure(
+            app.config.get('TAP_DEDUP_CAPACITY', self.capacity),
+            app.config.get('TAP_DEDUP_WINDOW_SECONDS', self.window_seconds)
+        )
+
+    @property
+    def enabled(self):
+        return self.window_seconds > 0
+
+    def lookup(self, nfc_tag_id, nfc_reader_id):
+        """Return the remembered (payload, status) for a repeat tap, or None."""
+        key = (nfc_tag_id, nfc_reader_id)
+        with self._lock:
+            self._counters['lookups'] += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, _, payload, status = entry
+            if expires_at < time.monotonic():
+                return None
+            self._counters['suppressed'] += 1
+            return payload, status
+
+    def remember(self, nfc_tag_id, nfc_reader_id, payload, status=200):
+        key = (nfc_tag_id, nfc_reader_id)
+        now = time.monotonic()
+        with self._lock:
+            slot = self._head
+            previous = self._ring[slot]
+            if previous is not None and previous != key:
+                entry = self._entries.get(previous)
+                # The previous key may have been re-remembered into a newer slot.
+                if entry is not None and entry[1] == slot:
+                    del self._entries[previous]
+                    if entry[0] >= now:
+                        self._counters['overwritten_live'] += 1
+
+            self._ring[slot] = key
+            self._entries[key] = (now + self.window_seconds, slot, payload, status)
+            self._head = (slot + 1) % self.capacity
+            self._counters['remembered'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._ring = [None] * self.capacity
+            self._entries = {}
+            self._head = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['enabled'] = self.enabled
+            stats['window_seconds'] = self.window_seconds
+            stats['capacity'] = self.capacity
+            stats['entries'] = len(self._entries)
+        return stats
+
+    def _configure(self, capacity, window_seconds):
+        with self._lock:
+            self.capacity = max(int(capacity), 1)
+            self.window_seconds = window_seconds
+            self._ring = [None] * self.capacity
+            self._entries = {}
+            self._head = 0
+            self._counters = {
+                'lookups': 0,
+                'suppressed': 0,
+                'remembered': 0,
+                'overwritten_live': 0
+            }
+
+
+tap_dedup = TapDedupWindow()
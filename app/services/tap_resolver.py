@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+from app.models.database import db, run_after_commit
+from app.models.student import Student
+from app.models.classroom import Classroom
+
+
+class TapResolver:
+    """
+    Process-local LRU cache for the two lookups at the start of every tap:
+    NFC tag -> (student id, full name) and NFC reader -> (classroom id, room number).
+
+    Entries are evicted by the SQLAlchemy events registered below whenever a
+    Student or Classroom row changes, both at flush time and again after commit.
+    Unknown tags and readers are never cached, so newly added rows are picked up
+    on their first tap. The events only see this process's writes, so entries
+    also expire TAP_RESOLVER_TTL_SECONDS after they were loaded.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._students = OrderedDict()
+        self._classrooms = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._counters = {
+            'student_hits': 0,
+            'student_misses': 0,
+            'classroom_hits': 0,
+            'classroom_misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0
+        }
+
+    def init_app(self, app):
+        self.maxsize = app.config.get('TAP_RESOLVER_CACHE_SIZE', self.maxsize)
+        self.ttl = app.config.get('TAP_RESOLVER_TTL_SECONDS', self.ttl)
+        self.clear()
+
+    def resolve_student(self, nfc_tag_id):
+        """Return (student_id, full_name) for an NFC tag, or None if unknown."""
+        return self._resolve(self._students, 'student', nfc_tag_id, self._load_student)
+
+    def resolve_classroom(self, nfc_reader_id):
+        """Return (classroom_id, room_number) for an NFC reader, or None if unknown."""
+        return self._resolve(self._classrooms, 'classroom', nfc_reader_id, self._load_classroom)
+
+    def invalidate_student(self, nfc_tag_id):
+        self._invalidate(self._students, nfc_tag_id)
+
+    def invalidate_classroom(self, nfc_reader_id):
+        self._invalidate(self._classrooms, nfc_reader_id)
+
+    def clear(self):
+        with self._lock:
+            self._students.clear()
+            self._classrooms.clear()
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['students_cached'] = len(self._students)
+            stats['classrooms_cached'] = len(self._classrooms)
+            stats['maxsize'] = self.maxsize
+        lookups = sum(stats[k] for k in ('student_hits', 'student_misses', 'classroom_hits', 'classroom_misses'))
+        hits = stats['student_hits'] + stats['classroom_hits']
+        stats['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _resolve(self, cache, kind, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = cache.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or now < expires_at:
+                    cache.move_to_end(key)
+                    self._counters[f'{kind}_hits'] += 1
+                    return value
+                del cache[key]
+                self._counters['expirations'] += 1
+            self._counters[f'{kind}_misses'] += 1
+            generation = self._generation
+
+        value = loader(key)
+        if value is None:
+            return None
+
+        with self._lock:
+            # Skip the insert if an invalidation raced with the load above,
+            # otherwise a pre-update row could be cached indefinitely.
+            if generation == self._generation:
+                cache[key] = (value, now + self.ttl if self.ttl else None)
+                cache.move_to_end(key)
+                while len(cache) > self.maxsize:
+                    cache.popitem(last=False)
+                    self._counters['evictions'] += 1
+        return value
+
+    def _invalidate(self, cache, key):
+        if key is None:
+            return
+        with self._lock:
+            cache.pop(key, None)
+            self._generation += 1
+            self._counters['invalidations'] += 1
+
+    @staticmethod
+    def _load_student(nfc_tag_id):
+        row = db.session.query(
+            Student.id, Student.first_name, Student.last_name
+        ).filter(Student.nfc_tag_id == nfc_tag_id).first()
+        if row is None:
+            return None
+        return row.id, f"{row.first_name} {row.last_name}"
+
+    @staticmethod
+    def _load_classroom(nfc_reader_id):
+        row = db.session.query(
+            Classroom.id, Classroom.room_number
+        ).filter(Classroom.nfc_reader_id == nfc_reader_id).first()
+        if row is None:
+            return None
+        return row.id, row.room_number
+
+
+tap_resolver = TapResolver()
+
+
+def _changed_keys(target, attr_name):
+    """Current and pre-flush values of a column, for evicting both mappings."""
+    keys = {getattr(target, attr_name)}
+    keys.update(inspect(target).attrs[attr_name].history.deleted)
+    keys.discard(None)
+    return keys
+
+
+def _evict_now_and_after_commit(target, attr_name, invalidate):
+    keys = _changed_keys(target, attr_name)
+
+    def evict():
+        for key in keys:
+            invalidate(key)
+
+    evict()
+    session = object_session(target)
+    if session is not None:
+        run_after_commit(session, evict)
+
+
+@event.listens_for(Student, 'after_update')
+@event.listens_for(Student, 'after_delete')
+def _student_changed(mapper, connection, target):
+    _evict_now_and_after_commit(target, 'nfc_tag_id', tap_resolver.invalidate_student)
+
+
+@event.listens_for(Classroom, 'after_update')
+@event.listens_for(Classroom, 'after_delete')
+def _classroom_changed(mapper, connection, target):
+    _evict_now_and_after_commit(target, 'nfc_reader_id', tap_resolver.invalidate_classroom)
@@ -0,0 +1,309 @@
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from app.models.database import db
+from app.models.attendance import Attendance
+
+
+class TapSpool:
+    """
+    Optional write-behind mode for the tap path.
+
+    Validated taps are appended as JSON lines to a local spool file and the
+    request returns 202 once its line is on disk. A syncer thread batches the
+    fsync calls of concurrent requests into one, and a writer thread drains
+    the synced part of the file into attendance_records in grouped
+    transactions, recording its progress in a checkpoint file next to the
+    spool. Anything past the checkpoint is replayed when the process restarts;
+    replays are harmless because the insert ignores existing rows. Check-ins
+    waiting in the spool are also kept in memory per (student, session), so a
+    repeat tap is answered with the queued check-in instead of queuing another.
+
+    A spool file must belong to a single process, so give each worker its own
+    TAP_SPOOL_PATH when running more than one.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self._app = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._drain_wakeup = threading.Event()
+        self._stopping = False
+        self._threads = []
+        self._appended_seq = 0
+        self._synced_seq = 0
+        self._appended_offset = 0
+        self._synced_offset = 0
+        self._drained_offset = 0
+        # (student_id, class_session_id) -> check_in_time of check-ins not yet drained
+        self._pending = {}
+        self._counters = {
+            'appended': 0,
+            'drained': 0,
+            'duplicates': 0,
+            'replayed': 0,
+            'fsyncs': 0,
+            'flushes': 0,
+            'flush_errors': 0
+        }
+        self._flush_ms = {'last': 0.0, 'max': 0.0, 'total': 0.0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('TAP_SPOOL_ENABLED', False)
+        if not self.enabled:
+            return
+
+        # Initialising again (another app, or after stop()) starts over with new threads
+        if self._threads:
+            self.stop()
+        self._stopping = False
+        self._appended_seq = self._synced_seq = 0
+        self._pending = {}
+
+        self._app = app
+        self.path = app.config.get('TAP_SPOOL_PATH') or os.path.join(app.instance_path, 'tap_spool.jsonl')
+        self.fsync_interval = app.config.get('TAP_SPOOL_FSYNC_INTERVAL', 0.005)
+        self.flush_interval = app.config.get('TAP_SPOOL_FLUSH_INTERVAL', 0.5)
+        self.flush_batch_size = app.config.get('TAP_SPOOL_FLUSH_BATCH_SIZE', 500)
+        self.compact_bytes = app.config.get('TAP_SPOOL_COMPACT_BYTES', 16 * 1024 * 1024)
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._drop_torn_tail()
+        self._appended_offset = self._synced_offset = self._file.tell()
+        self._drained_offset = self._read_checkpoint()
+        if self._drained_offset > self._synced_offset:
+            # The spool was truncated after its checkpoint was written.
+            self._drained_offset = 0
+        self._counters['replayed'] = self._load_pending(self._drained_offset, self._synced_offset)
+
+        self._threads = [
+            threading.Thread(target=self._sync_loop, name='tap-spool-sync', daemon=True),
+            threading.Thread(target=self._drain_loop, name='tap-spool-drain', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.stop)
+
+    def pending_check_in(self, student_id, class_session_id):
+        """The check-in time queued for a student and session but not drained yet, or None."""
+        with self._lock:
+            return self._pending.get((student_id, class_session_id))
+
+    def append(self, student_id, class_session_id, check_in_time, method='nfc_card'):
+        """
+        Durably queue one check-in; returns once its line has been fsynced.
+        Returns (queued, check_in_time): if the pair already has a check-in
+        waiting in the spool nothing is written and its time is returned.
+        """
+        line = json.dumps({
+            'student_id': student_id,
+            'class_session_id': class_session_id,
+            'check_in_time': check_in_time.isoformat(),
+            'method': method
+        }, separators=(',', ':')).encode() + b'\n'
+
+        with self._lock:
+            key = (student_id, class_session_id)
+            if key in self._pending:
+                return False, self._pending[key]
+            self._pending[key] = check_in_time
+            self._file.write(line)
+            self._appended_offset += len(line)
+            self._appended_seq += 1
+            seq = self._appended_seq
+            self._counters['appended'] += 1
+            self._synced.notify_all()
+            while self._synced_seq < seq:
+                self._synced.wait()
+        return True, check_in_time
+
+    def stop(self):
+        if not self.enabled or self._stopping:
+            return
+        with self._lock:
+            self._stopping = True
+            self._synced.notify_all()
+        self._drain_wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._file.close()
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        with self._lock:
+            stats = dict(self._counters)
+            stats['enabled'] = True
+            stats['path'] = self.path
+            stats['queue_depth'] = self._count_queued()
+            stats['spool_bytes'] = self._appended_offset
+            stats['undrained_bytes'] = self._synced_offset - self._drained_offset
+            flushes = self._counters['flushes']
+            stats['flush_latency_ms'] = {
+                'last': round(self._flush_ms['last'], 2),
+                'avg': round(self._flush_ms['total'] / flushes, 2) if flushes else 0.0,
+                'max': round(self._flush_ms['max'], 2)
+            }
+        return stats
+
+    def _sync_loop(self):
+        while True:
+            with self._lock:
+                while self._synced_seq == self._appended_seq and not self._stopping:
+                    self._synced.wait()
+                if self._stopping and self._synced_seq == self._appended_seq:
+                    return
+            # Let concurrent requests pile up behind one fsync.
+            time.sleep(self.fsync_interval)
+            with self._lock:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._synced_seq = self._appended_seq
+                self._synced_offset = self._appended_offset
+                self._counters['fsyncs'] += 1
+                self._synced.notify_all()
+            self._drain_wakeup.set()
+
+    def _drain_loop(self):
+        while True:
+            self._drain_wakeup.wait(self.flush_interval)
+            self._drain_wakeup.clear()
+            with self._app.app_context():
+                try:
+                    self._drain()
+                except Exception:
+                    with self._lock:
+                        self._counters['flush_errors'] += 1
+                    self._app.logger.exception('Tap spool flush failed; will retry')
+                finally:
+                    db.session.remove()
+            if self._stopping:
+                return
+
+    def _drain(self):
+        with self._lock:
+            end = self._synced_offset
+        if end <= self._drained_offset:
+            self._compact()
+            return
+
+        with open(self.path, 'rb') as spool:
+            spool.seek(self._drained_offset)
+            data = spool.read(end - self._drained_offset)
+
+        offset = self._drained_offset
+        rows = []
+        for line in data.splitlines(keepends=True):
+            offset += len(line)
+            try:
+                entry = json.loads(line)
+                entry['check_in_time'] = datetime.fromisoformat(entry['check_in_time'])
+                entry['status'] = 'present'
+                rows.append(entry)
+            except (ValueError, KeyError):
+                self._app.logger.warning('Skipping unreadable tap spool line at offset %d', offset - len(line))
+            if len(rows) >= self.flush_batch_size:
+                self._flush(rows, offset)
+                rows = []
+        if offset != self._drained_offset:
+            self._flush(rows, offset)
+        self._compact()
+
+    def _flush(self, rows, offset):
+        started = time.perf_counter()
+        try:
+            inserted = Attendance.insert_ignoring_duplicates(rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._write_checkpoint(offset)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._drained_offset = offset
+            for row in rows:
+                self._pending.pop((row['student_id'], row['class_session_id']), None)
+            self._counters['drained'] += len(inserted)
+            self._counters['duplicates'] += len(rows) - len(inserted)
+            self._counters['flushes'] += 1
+            self._flush_ms['last'] = elapsed_ms
+            self._flush_ms['total'] += elapsed_ms
+            self._flush_ms['max'] = max(self._flush_ms['max'], elapsed_ms)
+
+    def _compact(self):
+        """Truncate a fully drained spool once it grows past TAP_SPOOL_COMPACT_BYTES."""
+        with self._lock:
+            if (self._appended_offset < self.compact_bytes
+                    or self._drained_offset != self._appended_offset):
+                return
+            self._file.truncate(0)
+            self._file.seek(0)
+            os.fsync(self._file.fileno())
+            self._appended_offset = self._synced_offset = self._drained_offset = 0
+            self._write_checkpoint(0)
+
+    def _drop_torn_tail(self):
+        """Cut off a partial last line left by a crash mid-append."""
+        size = self._file.tell()
+        if size == 0:
+            return
+        with open(self.path, 'rb') as spool:
+            spool.seek(max(0, size - 65536))
+            tail = spool.read()
+        if tail.endswith(b'\n'):
+            return
+        cut = tail.rfind(b'\n')
+        keep = size - len(tail) + cut + 1 if cut >= 0 else max(0, size - len(tail))
+        self._file.truncate(keep)
+        self._file.seek(keep)
+        os.fsync(self._file.fileno())
+
+    def _count_queued(self):
+        return (self._counters['appended'] + self._counters['replayed']
+                - self._counters['drained'] - self._counters['duplicates'])
+
+    def _load_pending(self, start, end):
+        """Remember the check-ins between two offsets as pending; returns the number of lines."""
+        if end <= start:
+            return 0
+        with open(self.path, 'rb') as spool:
+            spool.seek(start)
+            lines = spool.read(end - start).splitlines()
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                self._pending[(entry['student_id'], entry['class_session_id'])] = \
+                    datetime.fromisoformat(entry['check_in_time'])
+            except (ValueError, KeyError):
+                continue
+        return len(lines)
+
+    @property
+    def _checkpoint_path(self):
+        return self.path + '.checkpoint'
+
+    def _read_checkpoint(self):
+        try:
+            with open(self._checkpoint_path) as checkpoint:
+                return int(checkpoint.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_checkpoint(self, offset):
+        tmp_path = self._checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as checkpoint:
+            checkpoint.write(str(offset))
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(tmp_path, self._checkpoint_path)
+
+
+tap_spool = TapSpool()
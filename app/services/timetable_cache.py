@@ -0,0 +1,130 @@
+import hashlib
+import json
+import threading
+from sqlalchemy import event, func
+from sqlalchemy.orm import object_session
+from app.models.database import db, run_after_commit
+from app.models.course import Course
+from app.models.classroom import Classroom
+from app.models.schedule import Schedule, ScheduleExclusion
+
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+class TimetableCache:
+    """
+    Built timetable payloads per (semester, classroom_id) filter, each with an
+    ETag derived from its content.
+
+    Entries are tagged with a version counter that every committed write to a
+    Schedule, Course or Classroom bumps; a lookup under a newer version rebuilds
+    the payload with one joined query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries = {}
+        self._counters = {
+            'hits': 0,
+            'misses': 0
+        }
+
+    def init_app(self, app):
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._entries = {}
+
+    def get(self, semester=None, classroom_id=None):
+        """Return (payload, etag) for a timetable filter."""
+        key = (semester, classroom_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._counters['hits'] += 1
+                return entry
+            self._counters['misses'] += 1
+            version = self._version
+
+        payload = build_timetable(semester, classroom_id)
+        body = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+        entry = (payload, hashlib.sha1(body).hexdigest())
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = entry
+        return entry
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['version'] = self._version
+            stats['entries'] = len(self._entries)
+        return stats
+
+
+def build_timetable(semester=None, classroom_id=None):
+    """Active schedules organized by day of week, from a single joined query."""
+    exclusion_counts = db.session.query(
+        ScheduleExclusion.schedule_id,
+        func.count().label('exclusion_count')
+    ).group_by(ScheduleExclusion.schedule_id).subquery()
+
+    query = db.session.query(
+        Schedule.id,
+        Schedule.day_of_week,
+        Schedule.start_time,
+        Schedule.end_time,
+        Schedule.semester,
+        Course.course_code,
+        Course.course_name,
+        Classroom.room_number,
+        func.coalesce(exclusion_counts.c.exclusion_count, 0).label('exclusion_count')
+    ).join(Course, Schedule.course_id == Course.id).join(
+        Classroom, Schedule.classroom_id == Classroom.id
+    ).outerjoin(
+        exclusion_counts, exclusion_counts.c.schedule_id == Schedule.id
+    ).filter(Schedule.is_active == True)
+
+    if semester:
+        query = query.filter(Schedule.semester == semester)
+    if classroom_id:
+        query = query.filter(Schedule.classroom_id == classroom_id)
+
+    timetable = {i: [] for i in range(7)}  # 0=Monday to 6=Sunday
+    for row in query.order_by(Schedule.day_of_week, Schedule.start_time):
+        start_time = row.start_time.strftime('%H:%M')
+        end_time = row.end_time.strftime('%H:%M')
+        timetable[row.day_of_week].append({
+            'id': row.id,
+            'course_code': row.course_code,
+            'course_name': row.course_name,
+            'classroom_name': row.room_number,
+            'start_time': start_time,
+            'end_time': end_time,
+            'time_range': f'{start_time} - {end_time}',
+            'semester': row.semester,
+            'exclusion_dates_count': row.exclusion_count
+        })
+
+    return {
+        'timetable': timetable,
+        'day_names': DAY_NAMES
+    }
+
+
+timetable_cache = TimetableCache()
+
+
+@event.listens_for(Schedule, 'after_insert')
+@event.listens_for(Schedule, 'after_update')
+@event.listens_for(Schedule, 'after_delete')
+@event.listens_for(Course, 'after_update')
+@event.listens_for(Classroom, 'after_update')
+def _timetable_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        run_after_commit(session, timetable_cache.invalidate)
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Class-Start Burst Load Test for the NFC Attendance Endpoint
+
+This script reproduces the thundering herd at the start of a period against
+/api/attendance/mark:
+- Seeds a throwaway database with N classrooms (one NFC reader and one running
+  class session each) and M students enrolled in those classes
+- Has every student tap their room's reader at a random moment inside a
+  configurable window, optionally tapping again a few seconds later
+- Fires the taps from a pool of worker threads, either through the Flask test
+  client (in-process) or over HTTP against a running server
+- Reports throughput, p50/p95/p99 latency, a status/error breakdown and, in
+  test-client mode, SQL queries per tap
+
+Results are written as JSON so runs can be compared over time.
+
+Usage:
+    python load_test_nfc.py --readers 25 --students 2000 --window 10
+    python load_test_nfc.py --url http://127.0.0.1:5000 --database-url sqlite:////path/to/attendance_system.db
+
+In HTTP mode the server must use the same database that was seeded, so pass
+the server's DATABASE_URL with --database-url and restart the server after
+seeding so its in-process caches start cold.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Burst load test for /api/attendance/mark')
+    parser.add_argument('--readers', type=int, default=25, help='number of classrooms/readers (default: 25)')
+    parser.add_argument('--students', type=int, default=2000, help='number of students tapping (default: 2000)')
+    parser.add_argument('--window', type=float, default=10.0, help='seconds over which taps arrive (default: 10)')
+    parser.add_argument('--repeat-rate', type=float, default=0.3,
+                        help='fraction of students who tap a second time (default: 0.3)')
+    parser.add_argument('--threads', type=int, default=32, help='concurrent tapping threads (default: 32)')
+    parser.add_argument('--url', help='base URL of a running server; omit to use the Flask test client')
+    parser.add_argument('--database-url', help='database to seed (default: a fresh SQLite file in a temp dir)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for tap timing (default: 42)')
+    parser.add_argument('--output', help='result file (default: loadtest_results/nfc_<timestamp>.json)')
+    return parser.parse_args()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class NFCLoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.random = random.Random(args.seed)
+
+        # The app reads DATABASE_URL when its config module is imported
+        if args.database_url:
+            os.environ['DATABASE_URL'] = args.database_url
+        else:
+            db_path = os.path.join(tempfile.mkdtemp(prefix='nfc_load_test_'), 'load_test.db')
+            os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+        from app import create_app
+        self.app = create_app()
+        self.query_count = 0
+        self.query_lock = threading.Lock()
+
+    def seed(self):
+        """Create classrooms, one running session per room, and enrolled students"""
+        from werkzeug.security import generate_password_hash
+        from app.models import db, User, Student, Course, CourseEnrollment, Classroom, ClassSession
+
+        print(f"Seeding {self.args.readers} readers and {self.args.students} students...")
+        run_tag = datetime.now().strftime('%H%M%S')
+        now = datetime.now()
+        start = max(now - timedelta(hours=1), now.replace(hour=0, minute=0, second=0, microsecond=0))
+        end = min(now + timedelta(hours=1, seconds=self.args.window), now.replace(hour=23, minute=59, second=59))
+
+        with self.app.app_context():
+            db.create_all()
+            # Hash once; hashing per user would dominate the seeding time
+            password_hash = generate_password_hash('student123')
+
+            rooms = []
+            for i in range(self.args.readers):
+                classroom = Classroom(
+                    room_number=f'LT{run_tag}-{i + 1:03d}',
+                    building='Load Test',
+                    capacity=self.args.students // max(self.args.readers, 1) + 1,
+                    nfc_reader_id=f'LT-READER-{run_tag}-{i + 1:03d}'
+                )
+                course = Course(
+                    course_code=f'LT{run_tag}{i + 1:03d}',
+                    course_name=f'Load Test Course {i + 1}',
+                    semester=1
+                )
+                db.session.add_all([classroom, course])
+                db.session.flush()
+                db.session.add(ClassSession(
+                    course_id=course.id,
+                    classroom_id=classroom.id,
+                    session_date=now.date(),
+                    start_time=start.time(),
+                    end_time=end.time()
+                ))
+                rooms.append((classroom.nfc_reader_id, course.id))
+
+            taps = []
+            for i in range(self.args.students):
+                user = User(
+                    username=f'lt{run_tag}{i + 1:05d}',
+                    email=f'lt{run_tag}{i + 1:05d}@loadtest.local',
+                    password_hash=password_hash,
+                    role='student'
+                )
+                db.session.add(user)
+                db.session.flush()
+
+                student = Student(
+                    student_id=f'LT{run_tag}{i + 1:05d}',
+                    user_id=user.id,
+                    first_name='Load',
+                    last_name=f'Tester {i + 1}',
+                    email=user.email,
+                    nfc_tag_id=f'LT{run_tag}{i + 1:05d}'
+                )
+                db.session.add(student)
+                db.session.flush()
+
+                reader_id, course_id = rooms[i % len(rooms)]
+                db.session.add(CourseEnrollment(student_id=student.id, course_id=course_id))
+                taps.append((student.nfc_tag_id, reader_id))
+
+                if (i + 1) % 500 == 0:
+                    db.session.commit()
+            db.session.commit()
+
+        return taps
+
+    def build_tap_plan(self, taps):
+        """Give every tap an offset inside the burst window, plus optional repeats"""
+        plan = []
+        for tag_id, reader_id in taps:
+            offset = self.random.uniform(0, self.args.window)
+            plan.append((offset, tag_id, reader_id))
+            if self.random.random() < self.args.repeat_rate:
+                plan.append((offset + self.random.uniform(0.5, 3.0), tag_id, reader_id))
+        plan.sort()
+        return plan
+
+    def count_queries(self):
+        from sqlalchemy import event
+        from app.models import db
+
+        def before_cursor_execute(*args):
+            with self.query_lock:
+                self.query_count += 1
+
+        with self.app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    def make_sender(self):
+        if self.args.url:
+            url = self.args.url.rstrip('/') + '/api/attendance/mark'
+
+            def send(tag_id, reader_id):
+                body = json.dumps({'nfc_tag_id': tag_id, 'nfc_reader_id': reader_id}).encode()
+                req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+                try:
+                    with urllib.request.urlopen(req, timeout=30) as response:
+                        return response.status, json.loads(response.read() or b'{}')
+                except urllib.error.HTTPError as e:
+                    return e.code, json.loads(e.read() or b'{}')
+            return send
+
+        client = self.app.test_client()
+
+        def send(tag_id, reader_id):
+            response = client.post('/api/attendance/mark', json={'nfc_tag_id': tag_id, 'nfc_reader_id': reader_id})
+            return response.status_code, response.get_json(silent=True) or {}
+        return send
+
+    def run(self, plan):
+        print(f"Firing {len(plan)} taps over {self.args.window}s with {self.args.threads} threads...")
+        results = []
+        results_lock = threading.Lock()
+        next_index = [0]
+        started = time.perf_counter()
+
+        def worker():
+            send = self.make_sender()
+            while True:
+                with results_lock:
+                    if next_index[0] >= len(plan):
+                        return
+                    offset, tag_id, reader_id = plan[next_index[0]]
+                    next_index[0] += 1
+
+                delay = started + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+                sent = time.perf_counter()
+                try:
+                    status, body = send(tag_id, reader_id)
+                    error = body.get('error')
+                except Exception as e:
+                    status, error = 'exception', f'{type(e).__name__}: {e}'
+                latency_ms = (time.perf_counter() - sent) * 1000
+
+                with results_lock:
+                    results.append((status, error, latency_ms, sent - started - offset))
+
+        threads = [threading.Thread(target=worker) for _ in range(self.args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results, time.perf_counter() - started
+
+    def report(self, results, elapsed):
+        latencies = sorted(latency for _, _, latency, _ in results)
+        lag = sorted(max(0.0, late) * 1000 for _, _, _, late in results)
+        statuses = Counter(str(status) for status, _, _, _ in results)
+        errors = Counter(error for _, error, _, _ in results if error)
+
+        return {
+            'run_at': datetime.now().isoformat(),
+            'mode': 'http' if self.args.url else 'test_client',
+            'target': self.args.url or 'flask-test-client',
+            'config': {
+                'readers': self.args.readers,
+                'students': self.args.students,
+                'window_seconds': self.args.window,
+                'repeat_rate': self.args.repeat_rate,
+                'threads': self.args.threads,
+                'seed': self.args.seed
+            },
+            'taps': len(results),
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_taps_per_second': round(len(results) / elapsed, 1) if elapsed else None,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(latencies[-1], 2),
+                'mean': round(sum(latencies) / len(latencies), 2)
+            },
+            # How far behind schedule taps were sent; large values mean the
+            # client threads, not the server, were the bottleneck.
+            'send_lag_ms_p99': round(percentile(lag, 99), 2),
+            'status_breakdown': dict(statuses),
+            'error_breakdown': dict(errors.most_common(20)),
+            'sql_queries_total': None if self.args.url else self.query_count,
+            'sql_queries_per_tap': None if self.args.url else round(self.query_count / len(results), 2)
+        }
+
+    def save(self, report):
+        output = self.args.output
+        if not output:
+            os.makedirs('loadtest_results', exist_ok=True)
+            output = os.path.join('loadtest_results', f"nfc_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        return output
+
+
+def main():
+    """Main function to run the load test"""
+    args = parse_args()
+    if args.readers < 1 or args.students < 1 or args.threads < 1:
+        print("ERROR: --readers, --students and --threads must all be at least 1.")
+        sys.exit(1)
+
+    load_test = NFCLoadTest(args)
+    taps = load_test.seed()
+    plan = load_test.build_tap_plan(taps)
+
+    if not args.url:
+        load_test.count_queries()
+    results, elapsed = load_test.run(plan)
+    report = load_test.report(results, elapsed)
+    output = load_test.save(report)
+
+    print("=" * 50)
+    print(f"Taps: {report['taps']} in {report['elapsed_seconds']}s "
+          f"({report['throughput_taps_per_second']} taps/s)")
+    latency = report['latency_ms']
+    print(f"Latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"Statuses: {report['status_breakdown']}")
+    if report['sql_queries_per_tap'] is not None:
+        print(f"SQL queries per tap: {report['sql_queries_per_tap']}")
+    print(f"Results saved to {output}")
+    print("=" * 50)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+import pytest
+from app import create_app
+from app.config import config, TestingConfig
+from app.models import db, User, Student, Course, CourseEnrollment, Classroom, ClassSession
+
+
+@pytest.fixture
+def config_overrides():
+    """Extra config values for the app fixture; override in a test module."""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, config_overrides):
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        WTF_CSRF_ENABLED = False
+        TAP_DEDUP_WINDOW_SECONDS = 0
+
+    for key, value in config_overrides.items():
+        setattr(Config, key, value)
+    config['pytest'] = Config
+    app = create_app('pytest')
+    with app.app_context():
+        db.create_all()
+        user = User(username='s1', email='s1@example.com', role='student')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.flush()
+        student = Student(student_id='S1', user_id=user.id, first_name='Ann', last_name='Lee', email='s1@example.com', nfc_tag_id='TAG1')
+        course = Course(course_code='CS1', course_name='Intro', semester=1)
+        rooms = [Classroom(room_number=f'R{n}', nfc_reader_id=f'READER{n}', capacity=30) for n in (1, 2)]
+        db.session.add_all([student, course, *rooms])
+        db.session.flush()
+        db.session.add(CourseEnrollment(student_id=student.id, course_id=course.id))
+        now = datetime.now()
+        for room in rooms:
+            db.session.add(ClassSession(
+                course_id=course.id, classroom_id=room.id, session_date=now.date(),
+                start_time=(now - timedelta(minutes=30)).time(), end_time=(now + timedelta(minutes=30)).time()
+            ))
+        db.session.commit()
+    yield app
+    config.pop('pytest', None)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+from app.models import db, Attendance
+
+
+def test_record_check_in_is_idempotent(app):
+    with app.app_context():
+        first_time = datetime.now()
+        created, attendance_id, check_in_time = Attendance.record_check_in(1, 1, first_time)
+        db.session.commit()
+        assert created
+        assert check_in_time == first_time
+
+        created, repeat_id, repeat_time = Attendance.record_check_in(1, 1, first_time + timedelta(minutes=5))
+        db.session.commit()
+        assert not created
+        assert repeat_id == attendance_id
+        assert repeat_time == first_time
+        assert Attendance.query.filter_by(student_id=1, class_session_id=1).count() == 1
+
+
+def test_record_check_in_keeps_sessions_apart(app):
+    with app.app_context():
+        assert Attendance.record_check_in(1, 1, datetime.now())[0]
+        assert Attendance.record_check_in(1, 2, datetime.now())[0]
+        db.session.commit()
+        assert Attendance.query.count() == 2
@@ -0,0 +1,59 @@
+import json
+import time
+import uuid
+from app.services.reader_auth import derive_reader_key, sign_request
+
+MASTER_KEY = 'test-master-key'
+
+
+def signed_post(client, path, reader_id, payload):
+    body = json.dumps(payload).encode()
+    timestamp = str(int(time.time()))
+    nonce = uuid.uuid4().hex
+    return client.post(path, data=body, content_type='application/json', headers={
+        'X-NFC-Reader-Id': reader_id,
+        'X-NFC-Timestamp': timestamp,
+        'X-NFC-Nonce': nonce,
+        'X-NFC-Signature': sign_request(derive_reader_key(MASTER_KEY, reader_id), timestamp, nonce, body)
+    })
+
+
+def test_batch_rejects_events_from_other_readers(app, client):
+    app.config['NFC_API_KEY'] = MASTER_KEY
+
+    response = signed_post(client, '/api/attendance/mark-batch', 'READER1', [
+        {'nfc_tag_id': 'TAG1', 'nfc_reader_id': 'READER2'},
+        {'nfc_tag_id': 'TAG1', 'nfc_reader_id': 'READER1'}
+    ])
+
+    assert response.status_code == 200
+    first, second = response.json['results']
+    assert first['status'] == 'rejected'
+    assert first['code'] == 401
+    assert second['status'] == 'marked'
+    assert second['classroom'] == 'R1'
+    assert response.json['summary']['rejected'] == 1
+
+
+def test_batch_accepts_any_reader_without_signing(app, client):
+    app.config['NFC_API_KEY'] = None
+
+    response = client.post('/api/attendance/mark-batch', json=[
+        {'nfc_tag_id': 'TAG1', 'nfc_reader_id': 'READER2'}
+    ])
+
+    assert response.json['results'][0]['status'] == 'marked'
+
+
+def test_non_hex_signature_is_rejected(app, client):
+    app.config['NFC_API_KEY'] = MASTER_KEY
+
+    response = client.post('/api/attendance/mark', json={'nfc_tag_id': 'TAG1', 'nfc_reader_id': 'READER1'}, headers={
+        'X-NFC-Reader-Id': 'READER1',
+        'X-NFC-Timestamp': str(int(time.time())),
+        'X-NFC-Nonce': uuid.uuid4().hex,
+        'X-NFC-Signature': 'é' * 64
+    })
+
+    assert response.status_code == 401
+    assert response.json['error'] == 'Reader authentication failed: bad signature'
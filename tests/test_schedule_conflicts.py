@@ -0,0 +1,74 @@
+from datetime import time
+from app.models import db, Schedule, ScheduleExclusion
+from app.services.schedule_conflicts import import_schedules
+
+
+def entry(classroom_id=1, day_of_week=0, start_time='09:00', end_time='10:00', **extra):
+    return dict({
+        'course_id': 1,
+        'classroom_id': classroom_id,
+        'day_of_week': day_of_week,
+        'start_time': start_time,
+        'end_time': end_time,
+        'semester': 1
+    }, **extra)
+
+
+def test_import_inserts_schedules_in_input_order(app):
+    entries = [
+        entry(start_time='11:00', end_time='12:00'),
+        entry(start_time='09:00', end_time='10:00', exclusion_dates=['2030-01-07']),
+        entry(classroom_id=2, start_time='09:30', end_time='10:30')
+    ]
+    with app.app_context():
+        schedule_ids, errors, conflicts = import_schedules(entries)
+        assert (errors, conflicts) == ([], [])
+        schedules = [db.session.get(Schedule, schedule_id) for schedule_id in schedule_ids]
+        assert [(s.classroom_id, s.start_time) for s in schedules] == [(1, time(11)), (1, time(9)), (2, time(9, 30))]
+        assert [row.schedule_id for row in ScheduleExclusion.query] == [schedule_ids[1]]
+
+
+def test_import_reports_conflicts_within_the_batch(app):
+    # The third entry only touches the second, which is not a conflict
+    entries = [entry(), entry(start_time='09:30', end_time='10:30'), entry(start_time='10:30', end_time='11:00')]
+    with app.app_context():
+        schedule_ids, errors, conflicts = import_schedules(entries)
+        assert schedule_ids == []
+        assert errors == []
+        assert [(c['index'], c['conflicts_with']['index']) for c in conflicts] == [(0, 1)]
+        assert Schedule.query.count() == 0
+
+
+def test_import_reports_conflicts_with_existing_schedules(app):
+    with app.app_context():
+        existing = Schedule(course_id=1, classroom_id=1, day_of_week=0, start_time=time(9), end_time=time(10), semester=1)
+        db.session.add(existing)
+        db.session.commit()
+
+        schedule_ids, errors, conflicts = import_schedules([entry(start_time='09:45', end_time='10:45'), entry(day_of_week=1)])
+        assert schedule_ids == []
+        assert len(conflicts) == 1
+        assert conflicts[0]['index'] == 0
+        assert conflicts[0]['conflicts_with']['schedule_id'] == existing.id
+
+
+def test_import_rejects_invalid_entries(app):
+    with app.app_context():
+        schedule_ids, errors, conflicts = import_schedules([
+            entry(start_time='10:00', end_time='09:00'),
+            entry(course_id=999),
+            {'course_id': 1}
+        ])
+        assert schedule_ids == []
+        assert [(e['index'], e['error']) for e in errors] == [
+            (0, 'Start time must be before end time'),
+            (2, 'Missing required fields'),
+            (1, 'Course not found')
+        ]
+        assert Schedule.query.count() == 0
+
+
+def test_dry_run_inserts_nothing(app):
+    with app.app_context():
+        assert import_schedules([entry()], dry_run=True) == ([], [], [])
+        assert Schedule.query.count() == 0
@@ -0,0 +1,73 @@
+from datetime import date, datetime, time, timedelta
+import pytest
+from app.models import db, Attendance, ClassSession
+from app.services.session_materializer import ScheduleSlot, sync_schedule_sessions
+
+TODAY = date.today()
+NOW = datetime.combine(TODAY, time(0, 30))
+
+
+@pytest.fixture
+def slot(app):
+    """A 10:00-11:00 slot three days out, with sessions materialized two weeks ahead."""
+    with app.app_context():
+        db.session.add(ClassSession(
+            course_id=1, classroom_id=2, session_date=TODAY + timedelta(days=14),
+            start_time=time(8), end_time=time(9)
+        ))
+        db.session.commit()
+    return ScheduleSlot(1, 1, (TODAY + timedelta(days=3)).weekday(), time(10), time(11), frozenset())
+
+
+def slot_sessions(start_time):
+    return ClassSession.query.filter_by(classroom_id=1, start_time=start_time).order_by(ClassSession.session_date).all()
+
+
+def test_sync_creates_sessions_up_to_the_horizon(app, slot):
+    with app.app_context():
+        assert sync_schedule_sessions([(None, slot)], now=NOW) == (2, 0)
+        db.session.commit()
+        sessions = slot_sessions(time(10))
+        assert [s.session_date for s in sessions] == [TODAY + timedelta(days=3), TODAY + timedelta(days=10)]
+
+
+def test_sync_skips_excluded_dates(app, slot):
+    with app.app_context():
+        excluded = slot._replace(excluded=frozenset({TODAY + timedelta(days=3)}))
+        assert sync_schedule_sessions([(None, excluded)], now=NOW) == (1, 0)
+
+
+def test_sync_updates_sessions_in_place(app, slot):
+    with app.app_context():
+        sync_schedule_sessions([(None, slot)], now=NOW)
+        ids = [s.id for s in slot_sessions(time(10))]
+
+        assert sync_schedule_sessions([(slot, slot._replace(end_time=time(11, 30)))], now=NOW) == (0, 0)
+        db.session.commit()
+        sessions = slot_sessions(time(10))
+        assert [s.id for s in sessions] == ids
+        assert all(s.end_time == time(11, 30) for s in sessions)
+
+
+def test_sync_moves_sessions_to_the_new_start(app, slot):
+    with app.app_context():
+        sync_schedule_sessions([(None, slot)], now=NOW)
+
+        moved = slot._replace(start_time=time(12), end_time=time(13))
+        assert sync_schedule_sessions([(slot, moved)], now=NOW) == (2, 2)
+        db.session.commit()
+        assert slot_sessions(time(10)) == []
+        assert len(slot_sessions(time(12))) == 2
+
+
+def test_sync_deactivates_attended_sessions_and_deletes_the_rest(app, slot):
+    with app.app_context():
+        sync_schedule_sessions([(None, slot)], now=NOW)
+        attended = slot_sessions(time(10))[0]
+        Attendance.record_check_in(1, attended.id, NOW)
+
+        assert sync_schedule_sessions([(slot, None)], now=NOW) == (0, 2)
+        db.session.commit()
+        remaining = slot_sessions(time(10))
+        assert [s.id for s in remaining] == [attended.id]
+        assert not remaining[0].is_active
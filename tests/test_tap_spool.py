@@ -0,0 +1,73 @@
+import json
+from datetime import datetime
+import pytest
+from app.models import db, Attendance
+from app.services.tap_spool import tap_spool, TapSpool
+
+
+@pytest.fixture
+def config_overrides(tmp_path):
+    return {'TAP_SPOOL_ENABLED': True, 'TAP_SPOOL_PATH': str(tmp_path / 'spool.jsonl'), 'TAP_SPOOL_FLUSH_INTERVAL': 0.05}
+
+
+@pytest.fixture(autouse=True)
+def stop_spool():
+    yield
+    tap_spool.stop()
+
+
+def tap(client):
+    return client.post('/api/attendance/mark', json={'nfc_tag_id': 'TAG1', 'nfc_reader_id': 'READER1'})
+
+
+def test_taps_are_queued_then_drained(app, client):
+    first = tap(client)
+    assert first.status_code == 202
+    assert first.json['message'] == 'Attendance queued'
+
+    repeat = tap(client)
+    assert repeat.status_code == 200
+    assert repeat.json['check_in_time'] == first.json['check_in_time']
+
+    # Stopping runs a last drain
+    tap_spool.stop()
+    with app.app_context():
+        rows = Attendance.query.all()
+    assert len(rows) == 1
+    assert rows[0].check_in_time.isoformat() == first.json['check_in_time']
+    assert rows[0].method == 'nfc_card'
+    stats = tap_spool.stats()
+    assert (stats['appended'], stats['drained'], stats['queue_depth']) == (1, 1, 0)
+
+
+def test_repeat_tap_after_drain_returns_the_stored_check_in(app, client):
+    first = tap(client)
+    tap_spool.stop()
+
+    repeat = tap(client)
+    assert repeat.status_code == 200
+    assert repeat.json['check_in_time'] == first.json['check_in_time']
+
+
+def test_undrained_spool_is_replayed_on_startup(app, tmp_path):
+    path = tmp_path / 'replay.jsonl'
+    check_in_time = datetime(2030, 1, 7, 9, 5)
+    with app.app_context():
+        Attendance.record_check_in(1, 2, check_in_time)
+        db.session.commit()
+    path.write_text(''.join(json.dumps({
+        'student_id': 1, 'class_session_id': session_id, 'check_in_time': check_in_time.isoformat(), 'method': 'nfc_card'
+    }) + '\n' for session_id in (1, 2)))
+
+    app.config['TAP_SPOOL_PATH'] = str(path)
+    spool = TapSpool()
+    spool.init_app(app)
+    assert spool.pending_check_in(1, 1) == check_in_time
+    spool.stop()
+
+    stats = spool.stats()
+    assert (stats['replayed'], stats['drained'], stats['duplicates'], stats['queue_depth']) == (1 + 1, 1, 1, 0)
+    assert spool.pending_check_in(1, 1) is None
+    with app.app_context():
+        assert Attendance.query.filter_by(class_session_id=1).one().check_in_time == check_in_time
+    assert (tmp_path / 'replay.jsonl.checkpoint').read_text() == str(path.stat().st_size)